@@ -0,0 +1,439 @@
+"""Benchmarks of walking, searching and purging synthetic Registries.
+
+The Registries are InMemoryBackends, so the benchmarks run on any OS.
+They are generated from a seed, with realistic shapes: Uninstall
+entries, Classes\\CLSID GUIDs with InprocServer32 sub keys, and vendor
+trees of configurable depth, fan out and values per key.
+
+E.g.:
+    python benchmarks/bench_registry.py --keys 10000 100000 --output results.json
+    python benchmarks/bench_registry.py --keys 100000 --baseline results.json
+    python benchmarks/bench_registry.py --keys 100000 --memory
+
+Each key costs roughly 1kB of memory, so 5M key Registries need ~5GB.
+"""
+from __future__ import annotations
+import gc
+import sys
+import json
+import time
+import uuid
+import random
+import pathlib
+import platform
+import tempfile
+import argparse
+import tracemalloc
+import statistics
+import subprocess
+import importlib.util
+import importlib.metadata
+from typing import Any, Callable, Iterator, Optional
+
+if importlib.util.find_spec("win_purge") is None:
+    sys.path.insert(0, str(pathlib.Path(__file__).parents[1] / "src"))
+
+from win_purge import backends, reglib, registry, uninstallers
+
+
+UNINSTALL = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+
+CLSID = r"SOFTWARE\Classes\CLSID"
+
+WORDS = [
+    "Acme", "Contoso", "Fabrikam", "Northwind", "Tailspin", "Litware",
+    "Adatum", "Wingtip", "Proseware", "Lucerne", "Margie", "Woodgrove",
+    "Studio", "Tools", "Runtime", "Driver", "Update", "Helper", "Player",
+    "Editor", "Agent", "Service", "Cloud", "Sync", "Viewer", "SDK",
+]  # fmt: skip
+
+
+class SyntheticRegistry:
+    """Builds an InMemoryBackend of about num_keys keys.
+
+    1% of the keys are Uninstall entries, 40% are CLSIDs (each
+    with an InprocServer32 sub key) and the rest are vendor trees.
+    """
+
+    def __init__(
+        self,
+        num_keys: int,
+        depth: int = 6,
+        fan_out: int = 8,
+        values_per_key: int = 4,
+        seed: int = 0,
+    ):
+        self.num_keys = num_keys
+        self.depth = depth
+        self.fan_out = fan_out
+        self.values_per_key = values_per_key
+        self.rng = random.Random(seed)
+        self.backend = backends.InMemoryBackend()
+        self.vendors: list[str] = []
+        self.keys_made = 0
+
+        self._build()
+
+    def _guid(self) -> str:
+        return "{%s}" % str(uuid.UUID(int=self.rng.getrandbits(128))).upper()
+
+    def _name(self) -> str:
+        return "".join(self.rng.sample(WORDS, 2))
+
+    def _create(self, parent: backends.Handle, name: str) -> backends.Handle:
+        self.keys_made += 1
+        return self.backend.create_key(parent, name)
+
+    def _set_values(self, key: backends.Handle, name: str) -> None:
+        set_value = self.backend.set_value
+        for i in range(self.values_per_key):
+            kind = i % 4
+            if kind == 0:
+                set_value(key, f"Name{i}", backends.REG_SZ, f"{name} {self._name()}")
+            elif kind == 1:
+                set_value(key, f"Flags{i}", backends.REG_DWORD, self.rng.getrandbits(31))
+            elif kind == 2:
+                set_value(
+                    key,
+                    f"Path{i}",
+                    backends.REG_EXPAND_SZ,
+                    rf"%ProgramFiles%\{name}\bin\{self._name()}.dll",
+                )
+            else:
+                set_value(
+                    key,
+                    f"Blob{i}",
+                    backends.REG_BINARY,
+                    self.rng.randbytes(self.rng.choice([16, 64, 256])),
+                )
+
+    def _build(self) -> None:
+        hklm = backends.HKEY_LOCAL_MACHINE
+        create_key = self.backend.create_key
+        set_value = self.backend.set_value
+
+        uninstall = create_key(hklm, UNINSTALL)
+        for __ in range(max(1, self.num_keys // 100)):
+            name = self._name()
+            entry = self._create(uninstall, self._guid())
+            set_value(entry, "DisplayName", backends.REG_SZ, name)
+            set_value(entry, "Publisher", backends.REG_SZ, name[: len(name) // 2])
+            set_value(entry, "DisplayVersion", backends.REG_SZ, "1.2.3")
+            set_value(
+                entry, "UninstallString", backends.REG_SZ, rf"C:\{name}\uninstall.exe"
+            )
+            set_value(
+                entry, "InstallLocation", backends.REG_SZ, rf"C:\Program Files\{name}"
+            )
+            set_value(entry, "EstimatedSize", backends.REG_DWORD, 1024)
+
+        clsid = create_key(hklm, CLSID)
+        for __ in range(self.num_keys * 2 // 10):
+            name = self._name()
+            class_key = self._create(clsid, self._guid())
+            set_value(class_key, "", backends.REG_SZ, f"{name} Class")
+            server = self._create(class_key, "InprocServer32")
+            set_value(server, "", backends.REG_SZ, rf"C:\Program Files\{name}\{name}.dll")
+            set_value(server, "ThreadingModel", backends.REG_SZ, "Apartment")
+
+        software = create_key(hklm, "SOFTWARE")
+        while self.keys_made < self.num_keys:
+            vendor = self._name()
+            self.vendors.append(vendor)
+            self._build_tree(self._create(software, vendor), vendor, self.depth)
+
+    def _build_tree(self, key: backends.Handle, name: str, depth: int) -> None:
+        self._set_values(key, name)
+        if depth <= 1:
+            return
+        for __ in range(self.rng.randint(1, self.fan_out)):
+            if self.keys_made >= self.num_keys:
+                return
+            self._build_tree(self._create(key, self._name()), name, depth - 1)
+
+    def search_terms(self, num_terms: int) -> list[str]:
+        # A mix of terms that are present (vendors) and absent (GUIDs),
+        # with at least one present, so every search measures matching.
+        num_present = min((num_terms + 1) // 2, len(self.vendors))
+        terms = self.rng.sample(self.vendors, num_present)
+        while len(terms) < num_terms:
+            terms.append(self._guid())
+        return terms
+
+
+class BenchmarkBackupMaker(reglib.InProcessKeyBackupMaker):
+    """Writes its .reg backups to a temporary directory, that is
+    removed again when they are consolidated."""
+
+    def __init__(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        super().__init__(pathlib.Path(self._tmp_dir.name))
+
+    def consolidate_tmp_backups(self, dir_: Optional[pathlib.Path] = None) -> None:
+        super().consolidate_tmp_backups(dir_)
+        self._tmp_dir.cleanup()
+
+
+def _time(func: Callable[[], Any], repeat: int) -> list[float]:
+    times = []
+    for __ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _peak_memory(func: Callable[[], Any]) -> tuple[int, Any]:
+    """The most memory func allocated at once (in bytes), and what it returned."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        returned = func()
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, returned
+
+
+def _count(iterator: Iterator[Any]) -> int:
+    return sum(1 for __ in iterator)
+
+
+def benchmarks(
+    synthetic: SyntheticRegistry,
+    term_counts: list[int],
+    workers: int,
+) -> Iterator[tuple[str, dict[str, Any], Callable[[], Any], bool]]:
+    """(name, params, function to time, whether it modifies the Registry)"""
+    global_root = reglib.GlobalRoot()
+
+    yield "walk", {}, lambda: _count(global_root.walk(max_depth=None)), False
+
+    for order in [reglib.PRE_ORDER, reglib.BREADTH_FIRST]:
+        yield (
+            "walk",
+            {"order": order},
+            # Each is timed before the next is yielded, as with the others.
+            lambda: _count(global_root.walk(max_depth=None, order=order)),
+            False,
+        )
+
+    yield (
+        "walk",
+        {"workers": workers},
+        lambda: _count(
+            global_root.walk(
+                max_depth=None, walker=reglib.ParallelWalker(workers=workers)
+            )
+        ),
+        False,
+    )
+
+    for num_terms in term_counts:
+        terms = synthetic.search_terms(num_terms)
+        for max_depth in [None, 5]:
+            yield (
+                "search",
+                {"terms": num_terms, "max_depth": max_depth},
+                lambda: _count(registry.search_registry_for_text(terms, max_depth)),
+                False,
+            )
+
+        string_types = "sz,expand_sz,multi_sz"
+        yield (
+            "search",
+            {"terms": num_terms, "max_depth": None, "value_types": string_types},
+            lambda: _count(
+                registry.search_registry_for_text(
+                    terms,
+                    None,
+                    engine=reglib.TraversalEngine(
+                        value_types=backends.value_types(string_types)
+                    ),
+                )
+            ),
+            False,
+        )
+
+        yield (
+            "search_results",
+            {"terms": num_terms},
+            # Held all at once, e.g. for a report.
+            lambda: list(registry.search_registry_for_text(terms, None)),
+            False,
+        )
+
+        yield (
+            "check_uninstallers",
+            {"terms": num_terms},
+            # Reading the index (once per run) and matching it.
+            lambda: _count(uninstallers.UninstallerIndex.read().matching(terms)),
+            False,
+        )
+
+    backup_maker = BenchmarkBackupMaker()
+
+    def delete_vendors() -> None:
+        # The first ten vendors' trees, backing up each one first.
+        for vendor in synthetic.vendors[:10]:
+            key = reglib.DeletableKey(
+                reglib.Root.HKLM, rf"SOFTWARE\{vendor}", backup_maker=backup_maker
+            )
+            if key.exists():
+                key.delete()
+        backup_maker.consolidate_tmp_backups()
+
+    yield "delete_with_backup", {"vendors": 10}, delete_vendors, True
+
+
+def _version() -> str:
+    try:
+        version = importlib.metadata.version("win-purge")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=pathlib.Path(__file__).parent,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return f"{version}+{commit}" if commit else version
+
+
+def _key(result: dict[str, Any]) -> str:
+    return json.dumps([result["benchmark"], result["keys"], result["params"]])
+
+
+def run(
+    key_counts: list[int],
+    term_counts: list[int],
+    repeat: int,
+    workers: int,
+    depth: int,
+    fan_out: int,
+    values_per_key: int,
+    seed: int,
+    memory: bool = False,
+) -> list[dict[str, Any]]:
+    results = []
+    version = _version()
+
+    for num_keys in key_counts:
+        start = time.perf_counter()
+        synthetic = SyntheticRegistry(num_keys, depth, fan_out, values_per_key, seed)
+        print(
+            f"Generated {synthetic.keys_made} keys "
+            f"in {time.perf_counter() - start:.2f}s",
+            file=sys.stderr,
+        )
+
+        backends.set_backend(synthetic.backend)
+
+        for name, params, func, modifies in benchmarks(synthetic, term_counts, workers):
+            # Anything that deletes keys can only be timed once per Registry.
+            times = _time(func, 1 if modifies else repeat)
+            result = {
+                "benchmark": name,
+                "keys": num_keys,
+                "params": params,
+                "seconds": times,
+                "min": min(times),
+                "median": statistics.median(times),
+                "depth": depth,
+                "fan_out": fan_out,
+                "values_per_key": values_per_key,
+                "seed": seed,
+                "version": version,
+                "python": platform.python_version(),
+            }
+            if memory and not modifies:
+                # Run again, as tracing slows it down.
+                peak, returned = _peak_memory(func)
+                result["peak_bytes"] = peak
+                if isinstance(returned, list) and returned:
+                    result["peak_bytes_per_result"] = peak // len(returned)
+            results.append(result)
+            print(
+                f"{name:>20} keys={num_keys:<9} {json.dumps(params):<36} "
+                f"min={result['min']:.4f}s median={result['median']:.4f}s",
+                file=sys.stderr,
+            )
+
+    backends.set_backend(None)
+
+    return results
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]]) -> None:
+    baseline_by_key = {_key(result): result for result in baseline}
+    print(f"Compared to baseline version: {baseline[0]['version']}", file=sys.stderr)
+    for result in results:
+        old = baseline_by_key.get(_key(result))
+        if old is None:
+            continue
+        ratio = result["min"] / old["min"] if old["min"] else float("inf")
+        print(
+            f"{result['benchmark']:>20} keys={result['keys']:<9} "
+            f"{json.dumps(result['params']):<36} {ratio:.2f}x baseline time",
+            file=sys.stderr,
+        )
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--keys", type=int, nargs="+", default=[10_000, 100_000], metavar="N"
+    )
+    parser.add_argument("--terms", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fan-out", type=int, default=8)
+    parser.add_argument("--values-per-key", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Also record each benchmark's peak memory (and per result, "
+        "of those that return their results). ",
+    )
+    parser.add_argument(
+        "--output", type=pathlib.Path, help="Write the results to this JSON file. "
+    )
+    parser.add_argument(
+        "--baseline",
+        type=pathlib.Path,
+        help="A JSON file from an earlier --output, to compare against. ",
+    )
+    namespace = parser.parse_args(args)
+
+    results = run(
+        key_counts=namespace.keys,
+        term_counts=namespace.terms,
+        repeat=namespace.repeat,
+        workers=namespace.workers,
+        depth=namespace.depth,
+        fan_out=namespace.fan_out,
+        values_per_key=namespace.values_per_key,
+        seed=namespace.seed,
+        memory=namespace.memory,
+    )
+
+    if namespace.output is not None:
+        namespace.output.write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+    if namespace.baseline is not None:
+        compare(results, json.loads(namespace.baseline.read_text()))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,104 @@
 import sys
+import pathlib
 import argparse
-from typing import Any, Callable, Collection
+from typing import Any, Callable
+
+from . import backends, stats, incremental, leftovers, output, regfile, reglib
 
 from .directories import search_directories, delete_directories
-from .registry import search_registry, delete_values_or_keys_from_registry
+from .registry import (
+    search_registry,
+    delete_values_or_keys_from_registry,
+    apply_purge_plans,
+)
+from .restore import restore_keys
 
-COMMANDS: dict[str, Callable[[Collection[str]], Any]] = {
+COMMANDS: dict[str, Callable[..., Any]] = {
     "purge-paths": delete_directories,
     "search-paths": search_directories,
     "purge-registry": delete_values_or_keys_from_registry,
     "search-registry": search_registry,
+    "restore": restore_keys,
+    "apply-plan": apply_purge_plans,
 }
 
+REGISTRY_COMMANDS = {"purge-registry", "search-registry"}
+
 DEFAULT_COMMAND = search_registry
 
+POSITIONAL_METAVARS = {"restore": "KEY", "apply-plan": "PLAN_FILE"}
+
+
+def _value_types(names: str) -> frozenset[int]:
+    try:
+        return backends.value_types(names)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _add_registry_walk_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads to walk the Registry with (default: 1, serial). ",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_false",
+        dest="ordered",
+        help="Report matches as soon as any worker finds them, "
+        "instead of in the same order as a serial walk. ",
+    )
+    parser.add_argument(
+        "--split-depth",
+        type=int,
+        default=2,
+        help="Depth below each root key at which to split the walk into "
+        "one task per sub key (default: 2, one per HKLM\\SOFTWARE\\* child). ",
+    )
+    parser.add_argument(
+        "--include-aliases",
+        action="store_true",
+        help="Also walk HKCR, HKCC and the keys in HKU that are views of other "
+        "keys (so their matches are reported twice, once at each path). ",
+    )
+    parser.add_argument(
+        "--value-types",
+        type=_value_types,
+        metavar="TYPES",
+        help="Only read and search the data of values of these types, e.g. "
+        "sz,expand_sz,multi_sz (all values' names are still searched). ",
+    )
+    parser.add_argument(
+        "--per-user",
+        action="store_true",
+        help="Only search the users' hives loaded in HKU, each in its own worker "
+        "(except the current user's, which is HKCU, unless --include-aliases). ",
+    )
+    parser.add_argument(
+        "--sid",
+        action="append",
+        dest="sids",
+        default=[],
+        metavar="SID",
+        help="Only search this user's hive in HKU (of those in HKU).  "
+        "Can be given more than once. ",
+    )
+    parser.add_argument(
+        "--exclude-sid",
+        action="append",
+        dest="exclude_sids",
+        default=[],
+        metavar="SID",
+        help="Do not search this user's hive in HKU.  Can be given more than once. ",
+    )
+    parser.add_argument(
+        "--ignore-case",
+        action="store_true",
+        help="Match search terms case insensitively. ",
+    )
+
 
 def main(args=sys.argv[1:]) -> int:
     parser = argparse.ArgumentParser()
@@ -25,14 +110,171 @@ def main(args=sys.argv[1:]) -> int:
     for command_name in COMMANDS:
         sub_parsers[command_name] = subparsers.add_parser(command_name)
 
-    # Args common to all subparsers
-    parser.add_argument("search_terms", action="extend", nargs="+", type=str)
+        # Args common to all subparsers
+        sub_parsers[command_name].add_argument(
+            "search_terms",
+            action="extend",
+            nargs="+",
+            type=str,
+            metavar=POSITIONAL_METAVARS.get(command_name, "search_terms"),
+        )
+        sub_parsers[command_name].add_argument(
+            "--stats",
+            action="store_true",
+            help="Print counts and timings of Registry operations etc. when done. ",
+        )
+
+    for command_name in REGISTRY_COMMANDS:
+        _add_registry_walk_args(sub_parsers[command_name])
+
+    for command_name in REGISTRY_COMMANDS | {"apply-plan", "restore"}:
+        sub_parsers[command_name].add_argument(
+            "--protected-keys",
+            action="append",
+            type=pathlib.Path,
+            default=[],
+            metavar="FILE",
+            help="Also protect the keys listed in FILE (under [restricted], "
+            "[do_not_alter_subkeys_of] or [do_not_delete_subkeys_of]). ",
+        )
+
+    sub_parsers["purge-registry"].add_argument(
+        "--compress-backups",
+        choices=regfile.COMPRESSIONS,
+        help="Compress this session's .reg backup file when done. ",
+    )
+
+    sub_parsers["search-registry"].add_argument(
+        "--skip-protected",
+        action="store_true",
+        help="Do not even read protected keys (or their sub keys), so matches "
+        "in them, which purge-registry would not change, are not reported. ",
+    )
+    sub_parsers["search-registry"].add_argument(
+        "--plan",
+        dest="plan_file",
+        metavar="PLAN_FILE",
+        help="Save everything purge-registry would change to PLAN_FILE, "
+        "to apply later with apply-plan (without searching again). ",
+    )
+
+    for command_name in ("search-paths", "purge-paths"):
+        sub_parsers[command_name].add_argument(
+            "--publisher",
+            default="",
+            help="Check <root>\\PUBLISHER\\<name> (instead of <root>\\<name>), "
+            "and PATH entries containing PUBLISHER. ",
+        )
+        sub_parsers[command_name].add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of threads to check candidate paths with (default: 8). ",
+        )
+
+    for command_name in ("search-paths", "purge-paths"):
+        sub_parsers[command_name].add_argument(
+            "--deep",
+            action="store_true",
+            help="Also scan Program Files, ProgramData and AppData for any other "
+            "files and directories with a search term in their names. ",
+        )
+        sub_parsers[command_name].add_argument(
+            "--scan-root",
+            action="append",
+            type=leftovers.scan_root,
+            dest="scan_roots",
+            metavar="DIR[=DEPTH]",
+            help="Deep scan DIR (to DEPTH levels, default: 3) instead of the "
+            "default roots.  Can be given more than once. ",
+        )
+        sub_parsers[command_name].add_argument(
+            "--exclude",
+            action="append",
+            dest="excludes",
+            default=[],
+            metavar="NAME",
+            help="Do not deep scan directories named NAME (or at NAME, if it is a "
+            "path).  Wildcards are allowed.  Can be given more than once. ",
+        )
+
+    for command_name in ("search-registry", "search-paths"):
+        sub_parsers[command_name].add_argument(
+            "--format",
+            choices=output.FORMATS,
+            default=output.TEXT,
+            dest="format_",
+            help="Print one JSON Lines or CSV record per match to stdout, "
+            "instead of text (everything else is printed to stderr). ",
+        )
+
+    sub_parsers["apply-plan"].add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only check which steps of the plan are still valid. ",
+    )
+
+    sub_parsers["restore"].add_argument(
+        "--backup",
+        type=pathlib.Path,
+        metavar="PATH",
+        help="Restore the keys from this backup, instead of from "
+        "the most recent backup of each one. ",
+    )
+    sub_parsers["restore"].add_argument(
+        "--backups-dir",
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Look for backups here (default: in %%APPDATA%%). ",
+    )
+    sub_parsers["restore"].add_argument(
+        "--list",
+        action="store_true",
+        dest="list_only",
+        help="Only show which backup would be restored from, and its keys. ",
+    )
+
+    sub_parsers["search-registry"].add_argument(
+        "--reg-file",
+        action="append",
+        dest="reg_files",
+        metavar="PATH",
+        help="Search this .reg file (e.g. from reg export) instead of the "
+        "Registry.  Can be given more than once. ",
+    )
+    sub_parsers["search-registry"].add_argument(
+        "--incremental",
+        nargs="?",
+        const=incremental.default_cache_path(),
+        dest="incremental_cache",
+        metavar="CACHE_FILE",
+        help="Skip reading values of keys unchanged since the last search for "
+        "the same terms (cached in CACHE_FILE, by default in %%APPDATA%%). ",
+    )
 
     namespace = parser.parse_args(args)
 
     command = COMMANDS.get(namespace.command, DEFAULT_COMMAND)
 
-    command(namespace.search_terms)
+    # Any other args are specific to the sub command's sub parser.
+    options = vars(namespace)
+    del options["command"]
+    search_terms = options.pop("search_terms")
+
+    for path in options.pop("protected_keys", []):
+        reglib.ReadableKey.load_policies(path)
+
+    if not options.pop("stats"):
+        command(search_terms, **options)
+        return 0
+
+    stats.enable()
+    try:
+        command(search_terms, **options)
+    finally:
+        run_stats = stats.disable()
+        if run_stats is not None:
+            print(run_stats.report(), file=sys.stderr)
 
     return 0
 
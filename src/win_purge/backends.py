@@ -0,0 +1,473 @@
+"""Backends that all of reglib's Registry access goes through.
+
+WinregBackend is the real Windows Registry.  InMemoryBackend is a
+tree of plain Python objects (built from a dict or a .reg file), so
+that searching, purging and backing up can be run, profiled and
+benchmarked on any OS.
+"""
+from __future__ import annotations
+import abc
+import time
+import pathlib
+from typing import Any, Iterable, Mapping, Optional, Union
+
+try:
+    import winreg
+except ImportError:
+    # Not on Windows.  Only the InMemoryBackend can be used.
+    winreg = None  # type: ignore[assignment]
+
+
+# The same values as winreg's constants, so that they are available
+# on any OS.
+HKEY_CLASSES_ROOT = 0x80000000
+HKEY_CURRENT_USER = 0x80000001
+HKEY_LOCAL_MACHINE = 0x80000002
+HKEY_USERS = 0x80000003
+HKEY_PERFORMANCE_DATA = 0x80000004
+HKEY_CURRENT_CONFIG = 0x80000005
+HKEY_DYN_DATA = 0x80000006
+
+KEY_READ = 0x20019
+KEY_WRITE = 0x20006
+KEY_ALL_ACCESS = 0xF003F
+
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_DWORD_BIG_ENDIAN = 5
+REG_LINK = 6
+REG_MULTI_SZ = 7
+REG_RESOURCE_LIST = 8
+REG_FULL_RESOURCE_DESCRIPTOR = 9
+REG_RESOURCE_REQUIREMENTS_LIST = 10
+REG_QWORD = 11
+
+# Names for --value-types, e.g. sz,expand_sz,multi_sz
+VALUE_TYPES = {
+    "none": REG_NONE,
+    "sz": REG_SZ,
+    "expand_sz": REG_EXPAND_SZ,
+    "binary": REG_BINARY,
+    "dword": REG_DWORD,
+    "dword_big_endian": REG_DWORD_BIG_ENDIAN,
+    "link": REG_LINK,
+    "multi_sz": REG_MULTI_SZ,
+    "resource_list": REG_RESOURCE_LIST,
+    "full_resource_descriptor": REG_FULL_RESOURCE_DESCRIPTOR,
+    "resource_requirements_list": REG_RESOURCE_REQUIREMENTS_LIST,
+    "qword": REG_QWORD,
+}
+
+# The longest a value's name can be (in characters, excluding the null).
+MAX_VALUE_NAME_LENGTH = 16383
+
+HKEY_CONSTS = {
+    "HKCR": HKEY_CLASSES_ROOT,
+    "HKCC": HKEY_CURRENT_CONFIG,
+    "HKCU": HKEY_CURRENT_USER,
+    "HKDD": HKEY_DYN_DATA,
+    "HKLM": HKEY_LOCAL_MACHINE,
+    "HKPD": HKEY_PERFORMANCE_DATA,
+    "HKU": HKEY_USERS,
+}
+
+
+def hkey_const(root_name: str) -> int:
+    """From either a root's abbreviation (e.g. HKLM)
+    or its full name (e.g. HKEY_LOCAL_MACHINE)."""
+    root_name = root_name.upper()
+    if root_name in HKEY_CONSTS:
+        return HKEY_CONSTS[root_name]
+    if root_name.startswith("HKEY_") and root_name in globals():
+        return globals()[root_name]
+    raise Exception(f"Non-existent Windows Registry root key: {root_name}")
+
+
+# e.g. REG_SZ: "REG_SZ"
+VALUE_TYPE_NAMES = {type_: f"REG_{name.upper()}" for name, type_ in VALUE_TYPES.items()}
+
+
+def value_types(names: str) -> frozenset[int]:
+    """From comma separated names, with or without the REG_ prefix,
+    e.g. sz,expand_sz,multi_sz or REG_BINARY"""
+    types = set()
+    for name in names.split(","):
+        name = name.strip().lower().removeprefix("reg_")
+        if name not in VALUE_TYPES:
+            raise ValueError(
+                f"Unknown Registry value type: {name!r}.  "
+                f"Use one of: {', '.join(VALUE_TYPES)}"
+            )
+        types.add(VALUE_TYPES[name])
+    return frozenset(types)
+
+
+# e.g. ("DisplayName", "Foo", REG_SZ)
+ValueTriple = tuple[str, Any, int]
+
+# A root's HKEY constant, or a handle returned by open_key
+Handle = Any
+
+
+def filetime_now() -> int:
+    # 100ns intervals since 1601-01-01, as returned by winreg.QueryInfoKey
+    return time.time_ns() // 100 + 116444736000000000
+
+
+class RegistryBackend(abc.ABC):
+    """The subset of winreg's API that reglib uses.  Any method that
+    takes a handle also accepts a root's HKEY constant."""
+
+    @abc.abstractmethod
+    def open_key(self, key: Handle, sub_key: str, access: int = KEY_READ) -> Handle:
+        """Raises an OSError (e.g. FileNotFoundError) if sub_key
+        does not exist or is inaccessible."""
+
+    @abc.abstractmethod
+    def close(self, handle: Handle) -> None:
+        pass
+
+    @abc.abstractmethod
+    def query_info_key(self, handle: Handle) -> tuple[int, int, int]:
+        """(number of sub keys, number of values, last write time)"""
+
+    @abc.abstractmethod
+    def enum_key(self, handle: Handle, index: int) -> str:
+        pass
+
+    @abc.abstractmethod
+    def enum_value(self, handle: Handle, index: int) -> ValueTriple:
+        pass
+
+    @abc.abstractmethod
+    def set_value(self, handle: Handle, name: str, type_: int, data: Any) -> None:
+        pass
+
+    @abc.abstractmethod
+    def delete_key(self, handle: Handle, sub_key: str) -> None:
+        """Raises an OSError if sub_key has sub keys of its own."""
+
+    @abc.abstractmethod
+    def delete_value(self, handle: Handle, name: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    def create_key(self, key: Handle, sub_key: str) -> Handle:
+        pass
+
+    def enum_keys(self, handle: Handle) -> list[str]:
+        num_sub_keys, __, __ = self.query_info_key(handle)
+        return [self.enum_key(handle, i) for i in range(num_sub_keys)]
+
+    def enum_values(self, handle: Handle) -> list[ValueTriple]:
+        __, num_values, __ = self.query_info_key(handle)
+        return [self.enum_value(handle, i) for i in range(num_values)]
+
+    def enum_value_types(self, handle: Handle) -> list[tuple[str, int]]:
+        """The names and types of a key's values, without their data
+        (if the backend can read them without it)."""
+        return [(name, type_) for name, __, type_ in self.enum_values(handle)]
+
+    def query_value(self, handle: Handle, name: str) -> tuple[Any, int]:
+        """(data, type) of one value.  Raises a FileNotFoundError
+        if there is no value called name."""
+        for name_, data, type_ in self.enum_values(handle):
+            if name_.lower() == name.lower():
+                return data, type_
+        raise FileNotFoundError(2, "The system cannot find the file specified", name)
+
+
+class WinregBackend(RegistryBackend):
+    def __init__(self):
+        if winreg is None:
+            raise Exception(
+                "The winreg module is only available on Windows. "
+                f"Use an {InMemoryBackend.__name__} instead. "
+            )
+
+        # winreg.EnumValue always reads a value's data too, however
+        # large.  RegEnumValueW need not, if given no buffer for it.
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        self._RegEnumValueW = ctypes.WinDLL("advapi32").RegEnumValueW
+        self._RegEnumValueW.argtypes = [
+            wintypes.HKEY,
+            wintypes.DWORD,
+            wintypes.LPWSTR,
+            wintypes.LPDWORD,
+            wintypes.LPDWORD,
+            wintypes.LPDWORD,
+            wintypes.LPBYTE,
+            wintypes.LPDWORD,
+        ]
+        self._RegEnumValueW.restype = wintypes.LONG
+        self._DWORD = wintypes.DWORD
+
+    def open_key(self, key: Handle, sub_key: str, access: int = KEY_READ) -> Handle:
+        return winreg.OpenKey(key, sub_key, 0, access)
+
+    def close(self, handle: Handle) -> None:
+        handle.Close()
+
+    def query_info_key(self, handle: Handle) -> tuple[int, int, int]:
+        return winreg.QueryInfoKey(handle)
+
+    def enum_key(self, handle: Handle, index: int) -> str:
+        return winreg.EnumKey(handle, index)
+
+    def enum_value(self, handle: Handle, index: int) -> ValueTriple:
+        return winreg.EnumValue(handle, index)
+
+    def enum_value_types(self, handle: Handle) -> list[tuple[str, int]]:
+        ctypes = self._ctypes
+        # Root keys' HKEY constants are sign extended, as in winreg.h
+        hkey = handle if isinstance(handle, int) else handle.handle
+        hkey = hkey - 2**32 if hkey & 0x80000000 and hkey < 2**32 else hkey
+
+        __, num_values, __ = self.query_info_key(handle)
+        name = ctypes.create_unicode_buffer(MAX_VALUE_NAME_LENGTH + 1)
+        type_ = self._DWORD()
+        names_and_types = []
+        for i in range(num_values):
+            length = self._DWORD(len(name))
+            error = self._RegEnumValueW(
+                hkey,
+                i,
+                name,
+                ctypes.byref(length),
+                None,
+                ctypes.byref(type_),
+                # No buffer, nor size, for the data.
+                None,
+                None,
+            )
+            if error:
+                raise ctypes.WinError(error)
+            names_and_types.append((name.value, type_.value))
+        return names_and_types
+
+    def query_value(self, handle: Handle, name: str) -> tuple[Any, int]:
+        return winreg.QueryValueEx(handle, name)
+
+    def set_value(self, handle: Handle, name: str, type_: int, data: Any) -> None:
+        winreg.SetValueEx(handle, name, 0, type_, data)
+
+    def delete_key(self, handle: Handle, sub_key: str) -> None:
+        winreg.DeleteKey(handle, sub_key)
+
+    def delete_value(self, handle: Handle, name: str) -> None:
+        winreg.DeleteValue(handle, name)
+
+    def create_key(self, key: Handle, sub_key: str) -> Handle:
+        return winreg.CreateKey(key, sub_key)
+
+
+class InMemoryKey:
+    __slots__ = ("name", "sub_keys", "values", "last_write")
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        # Both keyed by lower case name, as the Registry is case insensitive.
+        self.sub_keys: dict[str, InMemoryKey] = {}
+        self.values: dict[str, ValueTriple] = {}
+        self.last_write = filetime_now()
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.name!r})>"
+
+
+def _value_type(data: Any) -> int:
+    if isinstance(data, str):
+        return REG_SZ
+    if isinstance(data, int):
+        return REG_DWORD if 0 <= data < 2**32 else REG_QWORD
+    if isinstance(data, list):
+        return REG_MULTI_SZ
+    if isinstance(data, (bytes, bytearray)) or data is None:
+        return REG_BINARY
+    raise Exception(f"Cannot infer Registry value type of: {data!r}")
+
+
+class InMemoryBackend(RegistryBackend):
+    """A Registry held in memory.  Handles are simply the InMemoryKeys
+    themselves, and access rights are not enforced."""
+
+    def __init__(self):
+        self.roots = {hkey: InMemoryKey() for hkey in HKEY_CONSTS.values()}
+
+    @classmethod
+    def from_dict(cls, tree: Mapping[str, Mapping[str, Any]]) -> InMemoryBackend:
+        """E.g. {"HKLM": {"SOFTWARE": {"Acme": {"DisplayName": "Acme"}}}}
+
+        Within a key, dicts are sub keys, and anything else is a value.
+        Values' types are inferred, unless given as (data, type_) pairs.
+        """
+        backend = cls()
+        for root_name, sub_tree in tree.items():
+            backend._add_dict(backend.roots[hkey_const(root_name)], sub_tree)
+        return backend
+
+    def _add_dict(self, node: InMemoryKey, tree: Mapping[str, Any]) -> None:
+        for name, item in tree.items():
+            if isinstance(item, Mapping):
+                self._add_dict(self.create_key(node, name), item)
+            elif isinstance(item, tuple):
+                data, type_ = item
+                self.set_value(node, name, type_, data)
+            else:
+                self.set_value(node, name, _value_type(item), item)
+
+    @classmethod
+    def from_reg_files(
+        cls,
+        paths: Iterable[Union[str, pathlib.Path]],
+    ) -> InMemoryBackend:
+        """Imports .reg files (e.g. from reg export), in order."""
+        from . import regfile
+
+        backend = cls()
+        for path in paths:
+            for section in regfile.iter_sections(path):
+                root, __, rel_key = section.key.partition("\\")
+                hkey = hkey_const(root)
+                if section.deleted:
+                    backend._delete_tree(hkey, rel_key)
+                    continue
+                node = backend.create_key(hkey, rel_key)
+                for name in section.deleted_values:
+                    node.values.pop(name.lower(), None)
+                for name, data, type_ in section.values:
+                    backend.set_value(node, name, type_, data)
+        return backend
+
+    def _node(self, key: Handle) -> InMemoryKey:
+        return key if isinstance(key, InMemoryKey) else self.roots[key]
+
+    def _find(self, key: Handle, sub_key: str) -> InMemoryKey:
+        node = self._node(key)
+        for part in sub_key.split("\\"):
+            if not part:
+                continue
+            try:
+                node = node.sub_keys[part.lower()]
+            except KeyError:
+                raise FileNotFoundError(
+                    2, "The system cannot find the file specified", sub_key
+                )
+        return node
+
+    def open_key(self, key: Handle, sub_key: str, access: int = KEY_READ) -> Handle:
+        return self._find(key, sub_key)
+
+    def close(self, handle: Handle) -> None:
+        pass
+
+    def query_info_key(self, handle: Handle) -> tuple[int, int, int]:
+        node = self._node(handle)
+        return len(node.sub_keys), len(node.values), node.last_write
+
+    def enum_key(self, handle: Handle, index: int) -> str:
+        try:
+            return list(self._node(handle).sub_keys.values())[index].name
+        except IndexError:
+            raise OSError(259, "No more data is available")
+
+    def enum_value(self, handle: Handle, index: int) -> ValueTriple:
+        try:
+            return list(self._node(handle).values.values())[index]
+        except IndexError:
+            raise OSError(259, "No more data is available")
+
+    def enum_keys(self, handle: Handle) -> list[str]:
+        return [node.name for node in self._node(handle).sub_keys.values()]
+
+    def enum_values(self, handle: Handle) -> list[ValueTriple]:
+        return list(self._node(handle).values.values())
+
+    def enum_value_types(self, handle: Handle) -> list[tuple[str, int]]:
+        return [(name, type_) for name, __, type_ in self._node(handle).values.values()]
+
+    def query_value(self, handle: Handle, name: str) -> tuple[Any, int]:
+        try:
+            __, data, type_ = self._node(handle).values[name.lower()]
+        except KeyError:
+            raise FileNotFoundError(
+                2, "The system cannot find the file specified", name
+            )
+        return data, type_
+
+    def set_value(self, handle: Handle, name: str, type_: int, data: Any) -> None:
+        node = self._node(handle)
+        node.values[name.lower()] = (name, data, type_)
+        node.last_write = filetime_now()
+
+    def _parent_and_name(self, key: Handle, sub_key: str) -> tuple[InMemoryKey, str]:
+        parent_sub_key, __, name = sub_key.rstrip("\\").rpartition("\\")
+        if not name:
+            raise OSError(
+                f"{self.__class__.__name__} can only delete a key from a handle "
+                f"to one of its ancestors.  Got: {sub_key=}"
+            )
+        return self._find(key, parent_sub_key), name.lower()
+
+    def delete_key(self, handle: Handle, sub_key: str) -> None:
+        parent, name = self._parent_and_name(handle, sub_key)
+        if name not in parent.sub_keys:
+            raise FileNotFoundError(
+                2, "The system cannot find the file specified", sub_key
+            )
+        if parent.sub_keys[name].sub_keys:
+            raise PermissionError(5, "Access is denied", sub_key)
+        del parent.sub_keys[name]
+        parent.last_write = filetime_now()
+
+    def _delete_tree(self, key: Handle, sub_key: str) -> None:
+        try:
+            parent, name = self._parent_and_name(key, sub_key)
+        except FileNotFoundError:
+            return
+        if parent.sub_keys.pop(name, None) is not None:
+            parent.last_write = filetime_now()
+
+    def delete_value(self, handle: Handle, name: str) -> None:
+        node = self._node(handle)
+        try:
+            del node.values[name.lower()]
+        except KeyError:
+            raise FileNotFoundError(
+                2, "The system cannot find the file specified", name
+            )
+        node.last_write = filetime_now()
+
+    def create_key(self, key: Handle, sub_key: str) -> Handle:
+        node = self._node(key)
+        for part in sub_key.split("\\"):
+            if not part:
+                continue
+            if part.lower() not in node.sub_keys:
+                node.sub_keys[part.lower()] = InMemoryKey(part)
+                node.last_write = filetime_now()
+            node = node.sub_keys[part.lower()]
+        return node
+
+
+_backend: Optional[RegistryBackend] = None
+
+
+def get_backend() -> RegistryBackend:
+    """The backend used by keys that were not given one explicitly
+    (by default, the real Windows Registry)."""
+    global _backend
+    if _backend is None:
+        _backend = WinregBackend()
+    return _backend
+
+
+def set_backend(backend: Optional[RegistryBackend]) -> None:
+    global _backend
+    _backend = backend
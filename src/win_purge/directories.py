@@ -1,9 +1,12 @@
 import os
 import pathlib
-from typing import Iterable, Collection, Iterator
+import threading
+import concurrent.futures
+from typing import Iterable, Collection, Iterator, NamedTuple, Optional, Union
 
 import send2trash
 
+from . import leftovers, output, stats, uninstallers
 from .registry import check_uninstallers
 
 
@@ -15,64 +18,306 @@ def getenv(name: str) -> str:
 APPDATA = pathlib.Path(getenv("APPDATA"))
 
 
+def default_roots() -> list[pathlib.Path]:
+    """Where programs are commonly installed, each followed by
+    <publisher>/<name>."""
+    LOCALAPPDATA = pathlib.Path(getenv("LOCALAPPDATA"))
+    return [
+        # os.sep is needed.  getenv('SYSTEMDRIVE') returns c: on Windows.
+        #                    assert pathlib.Path(('c:', 'foo') == 'c:foo'
+        pathlib.Path(getenv("SYSTEMDRIVE") + os.sep),  # r'C:\' + name
+        pathlib.Path(getenv("PROGRAMFILES")),
+        pathlib.Path(getenv("PROGRAMFILES(X86)")),
+        APPDATA,
+        LOCALAPPDATA,
+        LOCALAPPDATA / "Programs",
+        LOCALAPPDATA.parent / "LocalLow",
+    ]
+
+
+def _key(path: Union[str, pathlib.Path]) -> str:
+    # The same directory, however it was written.
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _exists(path: pathlib.Path) -> bool:
+    run_stats = stats.current()
+    if run_stats is None:
+        return path.exists()
+    with run_stats.timed("path exists"):
+        return path.exists()
+
+
+class CandidateDirectories:
+    """PATH and the installation roots, read once (instead of once per
+    name).  PATH's entries are indexed by their lower-cased components,
+    so each name is only compared with each distinct component."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        roots: Optional[list[pathlib.Path]] = None,
+    ):
+        path = getenv("PATH") if path is None else path
+        self.path_entries = list(dict.fromkeys(filter(None, path.split(";"))))
+        self.roots = default_roots() if roots is None else roots
+
+        self._entries_by_component: dict[str, list[str]] = {}
+        for entry in self.path_entries:
+            for component in pathlib.PureWindowsPath(entry).parts:
+                entries = self._entries_by_component.setdefault(component.lower(), [])
+                if entry not in entries:
+                    entries.append(entry)
+
+    def path_entries_containing(self, text: str) -> list[str]:
+        """Case insensitively, in PATH's order."""
+        text = text.lower()
+        if not text:
+            return []
+
+        if "\\" in text or "/" in text:
+            # Could span components.
+            return [entry for entry in self.path_entries if text in entry.lower()]
+
+        found = {
+            entry
+            for component, entries in self._entries_by_component.items()
+            if text in component
+            for entry in entries
+        }
+        return [entry for entry in self.path_entries if entry in found]
+
+    def candidates(
+        self,
+        names: Iterable[str],
+        publisher: str = "",
+    ) -> list[pathlib.Path]:
+        """Without duplicates, so each is only checked once."""
+        if isinstance(names, str):
+            names = [names]
+
+        unique: dict[str, pathlib.Path] = {}
+
+        def add(paths: Iterable[Union[str, pathlib.Path]]) -> None:
+            for path in paths:
+                unique.setdefault(_key(path), pathlib.Path(path))
+
+        index = uninstallers.get_index()
+        publishers_entries = self.path_entries_containing(publisher)
+
+        for name in names:
+            add(self.path_entries_containing(name))
+            add(publishers_entries)
+
+            # Wherever the programs' own installers said they were installed.
+            add(index.install_locations([name]))
+
+            # An exact match with name is required in the remainder of cases.
+            add(root / publisher / name for root in self.roots)
+
+        run_stats = stats.current()
+        if run_stats is not None:
+            run_stats.add("candidate paths", len(unique))
+
+        return list(unique.values())
+
+    def existing(
+        self,
+        names: Iterable[str],
+        publisher: str = "",
+        workers: int = 8,
+    ) -> Iterator[pathlib.Path]:
+        """Checked concurrently, but yielded in the candidates' order."""
+        candidates = self.candidates(names, publisher)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, exists in zip(candidates, executor.map(_exists, candidates)):
+                if exists:
+                    yield path
+
+
 def candidate_installation_directories(
     names: Iterable[str], publisher=""
 ) -> Iterator[pathlib.Path]:
-    if isinstance(names, str):
-        names = [names]
-
-    SYSTEM_DRIVE = getenv("SYSTEMDRIVE") + os.sep
-
-    for name in names:
-        for path in getenv("PATH").split(";"):
-            if (
-                name.lower() in path.lower()
-                or publisher
-                and publisher.lower() in path.lower()
-            ):
-                yield pathlib.Path(path)
-
-        # An exact match with name is required in the remainder of cases.
-        yield pathlib.Path(SYSTEM_DRIVE) / publisher / name  # r'C:\' + name
-        # os.sep is needed.  getenv('SYSTEMDRIVE') returns c: on Windows.
-        #                    assert pathlib.Path(('c:', 'foo') == 'c:foo'
-        yield pathlib.Path(getenv("PROGRAMFILES")) / publisher / name
-        yield pathlib.Path(getenv("PROGRAMFILES(X86)")) / publisher / name
-        yield APPDATA / publisher / name
-        yield pathlib.Path(getenv("LOCALAPPDATA")) / publisher / name
-        yield pathlib.Path(getenv("LOCALAPPDATA")) / "Programs" / publisher / name
-        yield (
-            pathlib.Path(getenv("LOCALAPPDATA")).parent / "LocalLow" / publisher / name
+    yield from CandidateDirectories().candidates(names, publisher)
+
+
+def existing_installation_directories(
+    strs: Iterable[str],
+    publisher: str = "",
+    workers: int = 8,
+) -> Iterator[pathlib.Path]:
+    yield from CandidateDirectories().existing(strs, publisher, workers)
+
+
+def matching_paths(
+    args: Collection[str],
+    publisher: str = "",
+    workers: int = 8,
+    deep: bool = False,
+    scan_roots: Optional[list[leftovers.ScanRoot]] = None,
+    excludes: Iterable[str] = (),
+) -> Iterator[pathlib.Path]:
+    """The existing installation directories, then (if deep, or if
+    scan_roots are given) any other leftovers in or under them."""
+    found = set()
+
+    for path in existing_installation_directories(args, publisher, workers):
+        found.add(_key(path))
+        yield path
+
+    if not deep and not scan_roots:
+        return
+
+    for leftover in leftovers.deep_scan(
+        args,
+        scan_roots or None,
+        (*leftovers.DEFAULT_EXCLUDES, *excludes),
+        workers,
+    ):
+        # Not if it (or a directory it is in) was already found.
+        if any(_key(path) in found for path in (leftover.path, *leftover.path.parents)):
+            continue
+        found.add(_key(leftover.path))
+        yield leftover.path
+
+
+def search_directories(
+    args: Collection[str],
+    format_: str = output.TEXT,
+    publisher: str = "",
+    workers: int = 8,
+    deep: bool = False,
+    scan_roots: Optional[list[leftovers.ScanRoot]] = None,
+    excludes: Iterable[str] = (),
+) -> None:
+    with output.records(format_, output.PATH_FIELDS) as record_writer:
+        print(
+            'Checking directories.  Run with "purge-paths" to move the following paths to the Recycle Bin:'
         )
+        for path in matching_paths(
+            args, publisher, workers, deep, scan_roots, excludes
+        ):
+            if record_writer is None:
+                print(str(path))
+            else:
+                record_writer.write(dict(path=str(path)))
 
 
-def existing_installation_directories(strs: Iterable[str]) -> Iterator[pathlib.Path]:
-    for path in candidate_installation_directories(strs):
-        if path.exists():
-            yield path
+class Size(NamedTuple):
+    bytes: int
+    files: int
 
 
-def search_directories(args: Iterable[str]) -> None:
-    print(
-        'Checking directories.  Run with "purge-paths" to move the following paths to the Recycle Bin:'
-    )
-    for path in existing_installation_directories(args):
-        print(str(path))
+def size(path: pathlib.Path, cancelled: Optional[threading.Event] = None) -> Size:
+    """Of a file, or of all the files in a directory and its sub
+    directories (but not in junctions or symlinked directories).
+    Stops early (with the size so far) once cancelled is set."""
+    if not path.is_dir():
+        try:
+            return Size(path.stat().st_size, 1)
+        except OSError:
+            return Size(0, 0)
 
+    total = files = 0
+    stack = [str(path)]
+    while stack:
+        if cancelled is not None and cancelled.is_set():
+            break
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
 
-def _delete_directories(args: Iterable[str]) -> None:
-    print("WARNING!! Moving the following directories to the Recycle Bin: \n")
-    paths = existing_installation_directories(args)
-    for path in paths:
-        confirmation = input(f"Delete: {str(path)}? (y/n/quit) ")
+        for entry in entries:
+            if leftovers.is_walkable_dir(entry):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                try:
+                    total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                files += 1
+
+    return Size(total, files)
 
-        if confirmation.lower().startswith("q"):
+
+def human_readable(num_bytes: float) -> str:
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if num_bytes < 1024:
             break
+        num_bytes /= 1024
+    else:
+        unit = "TB"
+    return f"{num_bytes:.0f} {unit}" if unit == "bytes" else f"{num_bytes:.1f} {unit}"
+
+
+def _delete_directories(
+    args: Collection[str],
+    publisher: str = "",
+    workers: int = 8,
+    deep: bool = False,
+    scan_roots: Optional[list[leftovers.ScanRoot]] = None,
+    excludes: Iterable[str] = (),
+) -> None:
+    print("WARNING!! Moving the following directories to the Recycle Bin: \n")
+    paths = list(matching_paths(args, publisher, workers, deep, scan_roots, excludes))
+
+    confirmed = []
+    reclaimed = Size(0, 0)
+
+    # Every path's size is added up in the background, so it is usually
+    # ready by the time its prompt is shown.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    cancelled = threading.Event()
+    try:
+        sizes = [executor.submit(size, path, cancelled) for path in paths]
+
+        for path, future in zip(paths, sizes):
+            path_size = future.result()
+            confirmation = input(
+                f"Delete: {str(path)} ({human_readable(path_size.bytes)}, "
+                f"{path_size.files} files)? (y/n/quit) "
+            )
 
-        if confirmation.lower() == "y":
-            send2trash.send2trash(path)
+            if confirmation.lower().startswith("q"):
+                break
+
+            if confirmation.lower() == "y":
+                confirmed.append(path)
+                reclaimed = Size(
+                    reclaimed.bytes + path_size.bytes, reclaimed.files + path_size.files
+                )
+    finally:
+        # Stops the walks still running (e.g. after quitting), so none
+        # of them keeps the process alive, walking a huge tree.
+        cancelled.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if not confirmed:
+        return
+
+    # All at once (as quitting only skips the remaining paths).
+    send2trash.send2trash([str(path) for path in confirmed])
+
+    run_stats = stats.current()
+    if run_stats is not None:
+        run_stats.add("paths trashed", len(confirmed))
+        run_stats.add("bytes trashed", reclaimed.bytes)
+
+    print(
+        f"Moved {len(confirmed)} path(s) to the Recycle Bin, reclaiming "
+        f"{human_readable(reclaimed.bytes)} in {reclaimed.files} files. "
+    )
 
 
-def delete_directories(args: Collection[str]) -> None:
+def delete_directories(
+    args: Collection[str],
+    publisher: str = "",
+    workers: int = 8,
+    deep: bool = False,
+    scan_roots: Optional[list[leftovers.ScanRoot]] = None,
+    excludes: Iterable[str] = (),
+) -> None:
     check_uninstallers(args)
-    _delete_directories(args)
+    _delete_directories(args, publisher, workers, deep, scan_roots, excludes)
@@ -0,0 +1,185 @@
+"""Incremental searches, that skip reading the values of keys
+that have not changed since the last search for the same terms.
+
+A key's last write time (from QueryInfoKey) changes whenever one of
+its values, or one of its direct sub keys, is added, changed or
+deleted, but not when a deeper descendant changes.  So every key is
+still opened and its sub keys enumerated, but the values of an
+unchanged key are only needed if it matched last time, in which case
+they are in the cache file too.
+"""
+from __future__ import annotations
+import json
+import pathlib
+import warnings
+from typing import Any, Callable, Collection, Optional
+
+from . import backends, reglib, stats
+
+
+def default_cache_path() -> pathlib.Path:
+    return (
+        reglib.app_data_dir()
+        / reglib.CmdKeyBackupMaker.app_folder_name
+        / "search_cache.json"
+    )
+
+
+def _encode(data: Any) -> Any:
+    # JSON has no bytes.
+    if isinstance(data, (bytes, bytearray)):
+        return {"hex": bytes(data).hex()}
+    return data
+
+
+def _decode(data: Any) -> Any:
+    if isinstance(data, dict):
+        return bytes.fromhex(data["hex"])
+    return data
+
+
+class SearchCache:
+    """Each key's last write time, and the values of those keys that
+    matched, keyed by the key's path (e.g. HKLM\\SOFTWARE\\Acme).
+
+    Only valid for exactly the same search terms (and case sensitivity).
+    """
+
+    version = 2
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        matcher: reglib.TextMatcher,
+        value_types: Optional[Collection[int]] = None,
+    ):
+        self.path = path
+        self.matcher = matcher
+        self.value_types = value_types
+
+        # From the previous run:  path: (last write time, values if matched)
+        # Each value is [name, data, type].
+        self.previous: dict[str, tuple[int, Optional[list[list[Any]]]]] = {}
+
+        # From this run
+        self.last_writes: dict[str, int] = {}
+        self.matches: dict[str, list[list[Any]]] = {}
+
+        self._load()
+
+    def _fingerprint(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "strs": sorted(self.matcher.strs),
+            "case_insensitive": self.matcher.case_insensitive,
+            "value_types": (
+                None if self.value_types is None else sorted(self.value_types)
+            ),
+        }
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+
+        try:
+            with self.path.open("rt", encoding="utf8") as f:
+                cache = json.load(f)
+
+            if cache.get("fingerprint") != self._fingerprint():
+                # Searched for something else last time.
+                return
+
+            previous = {
+                path: (last_write, values)
+                for path, (last_write, values) in cache["keys"].items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            # e.g. truncated by an interrupted save.  Rebuilt by this search.
+            warnings.warn(f"Ignoring unreadable search cache: {self.path} ({e!r})")
+            return
+
+        self.previous = previous
+
+    def cached_values(
+        self,
+        key: reglib.ReadableKey,
+        last_write: int,
+    ) -> Optional[list[backends.ValueTriple]]:
+        """None if key is new or has changed.  Otherwise the values
+        it matched with, or [] if it did not match."""
+        previous = self.previous.get(str(key))
+
+        if previous is None or previous[0] != last_write:
+            return None
+
+        __, values = previous
+
+        return [(name, _decode(data), type_) for name, data, type_ in values or []]
+
+    def record_last_write(self, key: reglib.ReadableKey, last_write: int) -> None:
+        # Dict assignment is atomic, so ParallelWalker's workers can share this.
+        self.last_writes[str(key)] = last_write
+
+    def record_match(self, result: reglib.SearchResult) -> None:
+        key, __, __, __, vals, __ = result
+        self.matches[str(key)] = [
+            [name, _encode(data), vals.types.get(name.lower(), backends.REG_NONE)]
+            for name, data in vals.items()
+        ]
+
+    def engine(
+        self,
+        prune: Optional[Callable[[reglib.ReadableKey], bool]] = None,
+    ) -> IncrementalTraversalEngine:
+        return IncrementalTraversalEngine(
+            self, prune=prune, value_types=self.value_types
+        )
+
+    def save(self) -> None:
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+
+        keys = {
+            path: [last_write, self.matches.get(path)]
+            for path, last_write in self.last_writes.items()
+        }
+
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("wt", encoding="utf8") as f:
+            json.dump({"fingerprint": self._fingerprint(), "keys": keys}, f)
+        tmp_path.replace(self.path)
+
+
+class IncrementalTraversalEngine(reglib.TraversalEngine):
+    def __init__(
+        self,
+        cache: SearchCache,
+        access: int = backends.KEY_READ,
+        prune: Optional[Callable[[reglib.ReadableKey], bool]] = None,
+        value_types: Optional[Collection[int]] = None,
+    ):
+        super().__init__(access=access, prune=prune, value_types=value_types)
+        self.cache = cache
+        self.unchanged_keys = 0
+
+    def _read(self, key: reglib.ReadableKey, handle: backends.Handle) -> list[str]:
+        __, __, last_write = key.backend.query_info_key(handle)
+
+        self.cache.record_last_write(key, last_write)
+
+        cached_values = self.cache.cached_values(key, last_write)
+
+        if cached_values is None:
+            return super()._read(key, handle)
+
+        self.unchanged_keys += 1
+
+        run_stats = stats.current()
+        if run_stats is not None:
+            run_stats.add("keys visited")
+            run_stats.add("unchanged keys")
+
+        # Only for searching.  A key that did not match is given
+        # no values, so that it does not match again.
+        key._cache_registry_values(cached_values)
+
+        return key.backend.enum_keys(handle)
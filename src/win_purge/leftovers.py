@@ -0,0 +1,182 @@
+"""A deep scan for files and directories left behind by uninstalled
+programs, e.g. ProgramData\\<Vendor>\\<App>, nested vendor folders and
+stray files, that are not at the exact <root>\\<publisher>\\<name>
+paths search-paths checks.
+
+Each root is walked iteratively with os.scandir (whose entries already
+know their types, so no extra stat calls are needed), matching every
+entry's name against all the search terms at once.  A matching entry's
+contents are not walked (they would go with it).  The roots are scanned
+concurrently, one per worker.
+"""
+from __future__ import annotations
+import os
+import fnmatch
+import pathlib
+import concurrent.futures
+from typing import Collection, Iterable, Iterator, NamedTuple, Optional
+
+from . import reglib, stats
+
+
+# Junctions (e.g. AppData\Local\Application Data, which points to
+# AppData\Local) and symlinks are not followed, to avoid loops.
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+# Huge, and only ever Windows' own (or Store apps', which have their own
+# uninstallers).  Compared case insensitively with entries' names, or
+# full paths if they contain a separator.  Wildcards are allowed.
+DEFAULT_EXCLUDES = (
+    "Temp",
+    "WindowsApps",
+    "Packages",
+    "CrashDumps",
+    "Package Cache",
+)
+
+DEFAULT_MAX_DEPTH = 3
+
+
+class ScanRoot(NamedTuple):
+    path: pathlib.Path
+    # Of the deepest entries matched, e.g. 1 for only the root's children.
+    max_depth: int
+
+
+class Leftover(NamedTuple):
+    path: pathlib.Path
+    is_dir: bool
+    matched_term: str
+
+
+def default_scan_roots() -> list[ScanRoot]:
+    """Deep enough for <Vendor>\\<App>\\<Component>, except the Program
+    Files folders, whose programs were mostly installed by uninstallers."""
+    getenv = reglib.getenv
+    LOCALAPPDATA = getenv("LOCALAPPDATA")
+    roots = [
+        (getenv("PROGRAMFILES"), 2),
+        (getenv("PROGRAMFILES(X86)"), 2),
+        (getenv("PROGRAMDATA"), DEFAULT_MAX_DEPTH),
+        (getenv("APPDATA"), DEFAULT_MAX_DEPTH),
+        (LOCALAPPDATA, DEFAULT_MAX_DEPTH),
+        (
+            LOCALAPPDATA and str(pathlib.Path(LOCALAPPDATA).parent / "LocalLow"),
+            DEFAULT_MAX_DEPTH,
+        ),
+    ]
+    return [ScanRoot(pathlib.Path(path), depth) for path, depth in roots if path]
+
+
+def scan_root(arg: str) -> ScanRoot:
+    """From DIR or DIR=DEPTH, e.g. D:\\Apps=2"""
+    path, sep, depth = arg.rpartition("=")
+    if sep and depth.isdigit():
+        return ScanRoot(pathlib.Path(path), int(depth))
+    return ScanRoot(pathlib.Path(arg), DEFAULT_MAX_DEPTH)
+
+
+class Excludes:
+    def __init__(self, patterns: Iterable[str] = DEFAULT_EXCLUDES):
+        self.names = []
+        self.paths = []
+        for pattern in patterns:
+            pattern = os.path.normcase(pattern.lower())
+            if os.sep in pattern or "/" in pattern:
+                self.paths.append(os.path.normpath(pattern))
+            else:
+                self.names.append(pattern)
+
+    def __call__(self, entry: os.DirEntry) -> bool:
+        name = entry.name.lower()
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in self.names):
+            return True
+        if not self.paths:
+            return False
+        path = os.path.normcase(entry.path.lower())
+        return any(fnmatch.fnmatchcase(path, pattern) for pattern in self.paths)
+
+
+def is_walkable_dir(entry: os.DirEntry) -> bool:
+    if not entry.is_dir(follow_symlinks=False):
+        return False
+    # Free on Windows, from the same data as the entry's name.
+    attributes = getattr(entry.stat(follow_symlinks=False), "st_file_attributes", 0)
+    return not attributes & FILE_ATTRIBUTE_REPARSE_POINT
+
+
+def scan(
+    root: ScanRoot,
+    matcher: reglib.TextMatcher,
+    excludes: Optional[Excludes] = None,
+) -> list[Leftover]:
+    excludes = excludes or Excludes()
+    found = []
+    visited = 0
+    unreadable = 0
+
+    stack = [(str(root.path), 1)]
+
+    while stack:
+        dir_, depth = stack.pop()
+        try:
+            # Sorted, so results come in the same order every time.
+            with os.scandir(dir_) as it:
+                entries = sorted(it, key=lambda entry: entry.name.lower())
+        except OSError:
+            # e.g. PermissionError, or the root does not exist.
+            unreadable += 1
+            continue
+
+        visited += 1
+        children = []
+
+        for entry in entries:
+            if excludes(entry):
+                continue
+
+            matched = matcher.search(entry.name)
+            if matched is not None:
+                found.append(
+                    Leftover(
+                        pathlib.Path(entry.path),
+                        entry.is_dir(follow_symlinks=False),
+                        matched,
+                    )
+                )
+            elif depth < root.max_depth and is_walkable_dir(entry):
+                children.append((entry.path, depth + 1))
+
+        # Reversed, so they are popped (and found) in sorted order.
+        stack.extend(reversed(children))
+
+    run_stats = stats.current()
+    if run_stats is not None:
+        run_stats.add("directories scanned", visited)
+        run_stats.add("directories unreadable", unreadable)
+
+    return found
+
+
+def deep_scan(
+    search_terms: Collection[str],
+    roots: Optional[Iterable[ScanRoot]] = None,
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    workers: int = 8,
+) -> Iterator[Leftover]:
+    """Each root in its own worker, but yielded in the roots' order."""
+    # File names are case insensitive on Windows.
+    matcher = reglib.TextMatcher(search_terms, case_insensitive=True)
+    excludes_ = Excludes(excludes)
+
+    # Each root only once, however it was written.
+    unique_roots = {
+        os.path.normcase(os.path.normpath(root.path)): root
+        for root in (default_scan_roots() if roots is None else roots)
+    }
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for found in executor.map(
+            lambda root: scan(root, matcher, excludes_), unique_roots.values()
+        ):
+            yield from found
@@ -0,0 +1,166 @@
+"""Structured output of search results, one record per match, for other
+tools to read instead of the human readable lines, e.g.
+
+    win_purge search-registry Acme --format jsonl > matches.jsonl
+
+While the records are written to stdout, everything else that would
+have been printed to it (headers, warnings etc.) goes to stderr.
+
+Records are buffered, and written (and flushed) every flush_every
+records, or every flush_interval seconds, whichever comes first.  So
+even huge searches make few writes, but slow ones still show progress.
+"""
+from __future__ import annotations
+import io
+import abc
+import csv
+import sys
+import json
+import time
+import threading
+import contextlib
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+TEXT = "text"
+
+JSONL = "jsonl"
+
+CSV = "csv"
+
+FORMATS = (TEXT, JSONL, CSV)
+
+REGISTRY_FIELDS = (
+    "key",
+    "root",
+    # Of the user whose hive in HKU the key is in.
+    "sid",
+    "matched_term",
+    "value_name",
+    "value_type",
+    "path_variable",
+)
+
+PATH_FIELDS = ("path",)
+
+
+class RecordWriter(abc.ABC):
+    """Used as a context manager, a daemon thread also flushes any
+    buffered records every flush_interval seconds, e.g. during long
+    walks in which nothing else matches."""
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        stream: Optional[TextIO] = None,
+        flush_every: int = 1000,
+        flush_interval: float = 1.0,
+    ):
+        self.fields = tuple(fields)
+        self.stream = stream or sys.stdout
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self._lines: list[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    @abc.abstractmethod
+    def _format(self, record: dict[str, Any]) -> str:
+        """One record, as one or more lines of text."""
+
+    def write(self, record: dict[str, Any]) -> None:
+        line = self._format(record)
+        with self._lock:
+            self._lines.append(line)
+            self.records_written += 1
+            due = len(self._lines) >= self.flush_every or self._interval_elapsed()
+        if due:
+            self.flush()
+
+    def _interval_elapsed(self) -> bool:
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._lines:
+                self.stream.write("".join(self._lines))
+                self._lines.clear()
+            self.stream.flush()
+            self._last_flush = time.monotonic()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            with self._lock:
+                due = bool(self._lines) and self._interval_elapsed()
+            if due:
+                self.flush()
+
+    def __enter__(self) -> RecordWriter:
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+
+class JsonLinesWriter(RecordWriter):
+    def _format(self, record: dict[str, Any]) -> str:
+        return json.dumps({field: record.get(field) for field in self.fields}) + "\n"
+
+
+class CsvWriter(RecordWriter):
+    def __init__(self, fields: Iterable[str], *args, **kwargs):
+        super().__init__(fields, *args, **kwargs)
+        # Formats each row into this, so the rows can be buffered with
+        # the same lines as the other formats.
+        self._row = io.StringIO()
+        self._csv = csv.DictWriter(
+            self._row, self.fields, extrasaction="ignore", lineterminator="\n"
+        )
+        self._csv.writeheader()
+        self._lines.append(self._pop_row())
+
+    def _pop_row(self) -> str:
+        row = self._row.getvalue()
+        self._row.seek(0)
+        self._row.truncate()
+        return row
+
+    def _format(self, record: dict[str, Any]) -> str:
+        self._csv.writerow(record)
+        return self._pop_row()
+
+
+WRITERS: dict[str, type[RecordWriter]] = {JSONL: JsonLinesWriter, CSV: CsvWriter}
+
+
+def writer(
+    format_: str,
+    fields: Iterable[str],
+    stream: Optional[TextIO] = None,
+) -> RecordWriter:
+    if format_ not in WRITERS:
+        raise Exception(
+            f"Unsupported output format: {format_!r}.  Use one of: {', '.join(WRITERS)}"
+        )
+    return WRITERS[format_](fields, stream)
+
+
+@contextlib.contextmanager
+def records(format_: str, fields: Iterable[str]) -> Iterator[Optional[RecordWriter]]:
+    """None for the human readable text format, printed as before."""
+    if format_ == TEXT:
+        yield None
+        return
+
+    with writer(format_, fields, sys.stdout) as record_writer:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield record_writer
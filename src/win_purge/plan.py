@@ -0,0 +1,239 @@
+"""Purge plans: everything purge-registry would offer to change,
+saved by search-registry --plan, so that apply-plan can make the
+changes later, non-interactively, without walking the Registry again.
+
+Each step records a digest of its key's values as they were when
+searched.  apply-plan re-reads only the keys in the plan, and skips any
+that have changed (or gone) since.  The plan as a whole has a checksum,
+so a plan that has been edited (or corrupted) is refused.
+"""
+from __future__ import annotations
+import json
+import hashlib
+import pathlib
+import datetime
+from typing import Any, Collection, Optional, Union
+
+from . import reglib
+
+DELETE_KEY = "delete_key"
+
+DELETE_VALUES = "delete_values"
+
+EDIT_PATH = "edit_path"
+
+# Matches that cannot be purged, e.g. in restricted keys.  Recorded
+# so the plan shows everything search-registry found.
+SKIP = "skip"
+
+
+def _jsonable(data: Any) -> Any:
+    # JSON has no bytes.
+    if isinstance(data, (bytes, bytearray)):
+        return {"hex": bytes(data).hex()}
+    raise TypeError(f"Cannot serialise: {data!r}")
+
+
+def _checksum(obj: Any) -> str:
+    canonical = json.dumps(obj, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf8")).hexdigest()
+
+
+def values_digest(vals: reglib.CaseInsensitiveDict) -> str:
+    """Of a key's value names and data (regardless of their order)."""
+    return _checksum(sorted([name.lower(), data] for name, data in vals.items()))
+
+
+class PlanError(Exception):
+    pass
+
+
+class PurgePlan:
+    version = 1
+
+    def __init__(
+        self,
+        search_terms: Collection[str],
+        ignore_case: bool = False,
+        steps: Optional[list[dict[str, Any]]] = None,
+        uninstallers_found: bool = False,
+        created: Optional[str] = None,
+    ):
+        if "" in search_terms:
+            raise ValueError(
+                "Deleting the entire Windows registry is not a supported feature. \n"
+                "Purging based on an empty string will purge all registry keys."
+            )
+        self.search_terms = list(search_terms)
+        self.ignore_case = ignore_case
+        self.steps = steps or []
+        self.uninstallers_found = uninstallers_found
+        self.created = created or datetime.datetime.now().isoformat(timespec="seconds")
+
+        self.matcher = reglib.TextMatcher(
+            self.search_terms, case_insensitive=ignore_case
+        )
+        # PATH entries have always been matched case insensitively.
+        self.path_matcher = reglib.TextMatcher(
+            self.search_terms, case_insensitive=True
+        )
+
+    def _step(self, action: str, key: reglib.ReadableKey, **kwargs) -> None:
+        self.steps.append(
+            dict(
+                action=action,
+                key=str(key),
+                digest=values_digest(key.registry_values()),
+                **kwargs,
+            )
+        )
+
+    def add(self, result: reglib.SearchResult) -> None:
+        """The same decisions as purge-registry makes, for each match,
+        before asking for confirmation."""
+        key, __, val_name, val, vals, search_str = result
+
+        if key.restricted():
+            self._step(SKIP, key, reason="restricted key")
+            return
+
+        if not key.in_alterable_root():
+            self._step(SKIP, key, reason="sub key of restricted root")
+            return
+
+        names_of_path_env_variables = set(key.names_of_path_env_variables())
+
+        if names_of_path_env_variables:
+            for path_val_name in sorted(names_of_path_env_variables):
+                remove = reglib.path_lists().matching(
+                    vals[path_val_name], self.path_matcher
+                )
+                if remove:
+                    self._step(
+                        EDIT_PATH, key, value_name=path_val_name, remove=remove
+                    )
+
+        # Other matching values, e.g. in a key with a PSModulePath too.
+        if val_name or val:
+            other_path_lists = set(key.names_of_other_path_lists())
+            value_names = []
+            for name, __ in key.vals_or_val_names_containing(self.matcher):
+                if name in names_of_path_env_variables:
+                    continue
+                # Only a list of paths that matched itself is edited, and
+                # only if some of its entries matched (not just its name).
+                remove = (
+                    reglib.path_lists().matching(vals[name], self.path_matcher)
+                    if name in other_path_lists
+                    else []
+                )
+                if remove:
+                    self._step(EDIT_PATH, key, value_name=name, remove=remove)
+                else:
+                    value_names.append(name)
+            if value_names:
+                self._step(DELETE_VALUES, key, value_names=value_names)
+
+        if search_str:
+            if not key.can_delete_subkeys_of_parents():
+                self._step(SKIP, key, reason="cannot delete sub keys of a parent")
+                return
+            self._step(DELETE_KEY, key)
+
+    def as_dict(self) -> dict[str, Any]:
+        plan = dict(
+            version=self.version,
+            created=self.created,
+            search_terms=self.search_terms,
+            ignore_case=self.ignore_case,
+            uninstallers_found=self.uninstallers_found,
+            steps=self.steps,
+        )
+        plan["checksum"] = _checksum(plan)
+        return plan
+
+    def save(self, path: Union[str, pathlib.Path]) -> None:
+        with open(path, "wt", encoding="utf8") as f:
+            json.dump(self.as_dict(), f, indent=2, default=_jsonable)
+
+    @classmethod
+    def load(cls, path: Union[str, pathlib.Path]) -> PurgePlan:
+        with open(path, "rt", encoding="utf8") as f:
+            plan = json.load(f)
+
+        checksum = plan.pop("checksum", None)
+        if checksum != _checksum(plan):
+            raise PlanError(f"Purge plan: {path} has been altered since it was made. ")
+
+        if plan.get("version") != cls.version:
+            raise PlanError(f"Unsupported purge plan version: {plan.get('version')}")
+
+        return cls(
+            search_terms=plan["search_terms"],
+            ignore_case=plan["ignore_case"],
+            steps=plan["steps"],
+            uninstallers_found=plan["uninstallers_found"],
+            created=plan["created"],
+        )
+
+
+def _current_values(
+    key: reglib.ReadableKey,
+) -> Optional[dict[str, tuple[Any, int]]]:
+    # Read afresh, with types, or None if key no longer exists.
+    if not key.exists():
+        return None
+    return {
+        name.lower(): (data, type_)
+        for name, data, type_ in key.iter_names_data_and_types()
+    }
+
+
+def validate(step: dict[str, Any]) -> Optional[str]:
+    """Why step should no longer be applied, if it should not."""
+    key = reglib.ReadableKey.from_str(step["key"])
+
+    if key.restricted() or not key.in_alterable_root():
+        return "restricted"
+
+    values = _current_values(key)
+    if values is None:
+        return "no longer exists"
+
+    vals = reglib.CaseInsensitiveDict(
+        (name, data) for name, (data, __) in values.items()
+    )
+    if values_digest(vals) != step["digest"]:
+        return "values have changed since the plan was made"
+
+    return None
+
+
+def apply(step: dict[str, Any]) -> None:
+    """Without backing up the key, e.g. as it was already backed up."""
+    action, name = step["action"], step["key"]
+
+    if action == DELETE_KEY:
+        reglib.DeletableKey.from_str(name)._delete(save_backup_first=False)
+
+    elif action == DELETE_VALUES:
+        key = reglib.KeyWithDeletableValueNamesAndValues.from_str(name)
+        for value_name in step["value_names"]:
+            key._delete_value_and_value_name(value_name, save_backup_first=False)
+
+    elif action == EDIT_PATH:
+        writable_key = reglib.ReadAndWritableKey.from_str(name)
+        value_name = step["value_name"]
+        values = _current_values(writable_key) or {}
+        data, type_ = values[value_name.lower()]
+        remove = step["remove"]
+        writable_key._set_registry_value_data(
+            name=value_name,
+            data=reglib.path_lists().without(data, remove),
+            # Keep REG_EXPAND_SZ paths expandable.
+            type_=type_,
+            save_backup_first=False,
+        )
+
+    else:
+        raise PlanError(f"Unknown purge plan action: {action}")
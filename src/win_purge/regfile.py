@@ -0,0 +1,484 @@
+"""Reads and writes the .reg files made by regedit and reg export.
+
+Files are read line by line, and only one key's values are
+held in memory at once, so arbitrarily large exports can be streamed.
+They can also be read from gzip (.reg.gz) or zip (.zip) files.
+"""
+from __future__ import annotations
+import io
+import re
+import json
+import gzip
+import codecs
+import shutil
+import pathlib
+import zipfile
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional, Union
+
+from .backends import (
+    ValueTriple,
+    REG_SZ,
+    REG_EXPAND_SZ,
+    REG_DWORD,
+    REG_MULTI_SZ,
+    REG_QWORD,
+    REG_BINARY,
+)
+
+HEADER = "Windows Registry Editor Version 5.00"
+
+# What regedit and reg export write, and reg import expects.
+ENCODING = "utf-16-le"
+
+BOM = "\ufeff"
+
+NEWLINE = "\r\n"
+
+# regedit wraps hex values, so no line is longer than this.
+MAX_LINE_LENGTH = 80
+
+# For copying whole files.
+BUFFER_SIZE = 2**20
+
+COMPRESSIONS = ("gzip", "zip")
+
+
+class RegSection(NamedTuple):
+    # Including the root, e.g. HKEY_LOCAL_MACHINE\SOFTWARE\Acme
+    key: str
+    # [-HKEY_LOCAL_MACHINE\SOFTWARE\Acme]
+    deleted: bool
+    values: list[ValueTriple]
+    # "name"=-
+    deleted_values: list[str]
+
+
+class RegFileError(Exception):
+    pass
+
+
+def _iter_binary_files(
+    path: Union[str, pathlib.Path],
+) -> Iterator[Union[IO[bytes], gzip.GzipFile]]:
+    # Every .reg file in a zip, in order.
+    suffix = pathlib.Path(path).suffix.lower()
+    if suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            yield f
+    elif suffix == ".zip":
+        with zipfile.ZipFile(path) as zip_file:
+            for name in zip_file.namelist():
+                if name.lower().endswith(".reg"):
+                    with zip_file.open(name) as f:
+                        yield f
+    else:
+        with open(path, "rb") as f:
+            yield f
+
+
+def detect_encoding(path: Union[str, pathlib.Path]) -> str:
+    for f in _iter_binary_files(path):
+        return _detect_encoding(f.read(4))
+    return "utf-8"
+
+
+def _detect_encoding(start: bytes) -> str:
+    if start.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        # regedit and reg export both write UTF-16 (LE, with a BOM).
+        return "utf-16"
+    if start.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    return "utf-8"
+
+
+_VALUE_LINE = re.compile(r'(?:@|"((?:[^"\\]|\\.)*)")\s*=\s*(.*)', re.DOTALL)
+
+_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"\s*$', re.DOTALL)
+
+_UNTERMINATED_STRING = re.compile(
+    r'(?:@|"(?:[^"\\]|\\.)*")\s*=\s*"(?:[^"\\]|\\.)*$', re.DOTALL
+)
+
+# The rest of a string started on an earlier line.
+_STRING_END = re.compile(r'(?:[^"\\]|\\.)*"\s*$', re.DOTALL)
+
+_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+
+_HEX = re.compile(r"hex(?:\(([0-9a-fA-F]+)\))?:(.*)", re.DOTALL)
+
+
+def _unescape(str_: str) -> str:
+    if "\\" not in str_:
+        return str_
+    return _ESCAPE.sub(r"\1", str_)
+
+
+# Registry values are limited only by memory, but the Registry's own
+# guidance is to keep them under 2048 bytes.
+MAX_LOGICAL_LINE_LENGTH = 2**24
+
+
+def iter_logical_lines(
+    lines: Iterable[str],
+    max_length: int = MAX_LOGICAL_LINE_LENGTH,
+) -> Iterator[str]:
+    """Joins hex values continued over several lines (ending in \\),
+    and strings containing line breaks, into single lines.  Raises
+    RegFileError rather than joining more than max_length characters."""
+    pending: list[str] = []
+    pending_length = 0
+    in_string = False
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if pending:
+            pending_length += len(line)
+            if pending_length > max_length:
+                raise RegFileError(
+                    f"Value longer than {max_length} characters, "
+                    f"starting: {pending[0][:200]!r}"
+                )
+
+        if in_string:
+            pending.append(line)
+            if not _STRING_END.match(line):
+                continue
+            in_string = False
+            yield "\n".join(pending)
+            pending = []
+            continue
+
+        if pending:
+            line = line.lstrip()
+
+        stripped = line.rstrip()
+
+        if stripped.endswith("\\") and not stripped.endswith('"'):
+            if not pending:
+                pending_length = len(stripped)
+            pending.append(stripped[:-1])
+            continue
+
+        if pending:
+            pending.append(line)
+            yield "".join(pending)
+            pending = []
+            continue
+
+        if _UNTERMINATED_STRING.match(line):
+            pending.append(line)
+            pending_length = len(line)
+            in_string = True
+            continue
+
+        yield line
+
+    if pending:
+        yield ("\n" if in_string else "").join(pending)
+
+
+def decode_hex(type_: int, raw: bytes) -> Any:
+    """As winreg.EnumValue would return the data."""
+    if type_ in (REG_SZ, REG_EXPAND_SZ):
+        return raw.decode("utf-16-le", errors="replace").split("\0", 1)[0]
+    if type_ == REG_MULTI_SZ:
+        strs = raw.decode("utf-16-le", errors="replace").split("\0")
+        while strs and not strs[-1]:
+            strs.pop()
+        return strs
+    if type_ in (REG_DWORD, REG_QWORD):
+        return int.from_bytes(raw, "little")
+    return raw
+
+
+def parse_value(line: str) -> Optional[tuple[str, Any, Optional[int]]]:
+    """Returns (name, data, type_), with a type_ of None for
+    values that are deleted ("name"=-), or None if line is not a value."""
+    match = _VALUE_LINE.match(line)
+    if match is None:
+        return None
+
+    quoted_name, rest = match.groups()
+    name = "" if quoted_name is None else _unescape(quoted_name)
+    rest = rest.strip()
+
+    if rest == "-":
+        return name, None, None
+
+    string_match = _STRING.match(rest)
+    if string_match is not None:
+        return name, _unescape(string_match.group(1)), REG_SZ
+
+    if rest.lower().startswith("dword:"):
+        return name, int(rest[len("dword:") :], 16), REG_DWORD
+
+    hex_match = _HEX.match(rest)
+    if hex_match is not None:
+        type_str, hex_str = hex_match.groups()
+        type_ = REG_BINARY if type_str is None else int(type_str, 16)
+        raw = bytes.fromhex("".join(hex_str.split()).replace(",", ""))
+        return name, decode_hex(type_, raw), type_
+
+    raise RegFileError(f"Unrecognised value data: {line!r}")
+
+
+def iter_sections_from_lines(lines: Iterable[str]) -> Iterator[RegSection]:
+    section: Optional[RegSection] = None
+
+    for line in iter_logical_lines(lines):
+        if not line or line.startswith(";"):
+            continue
+
+        if line.startswith("[") and line.rstrip().endswith("]"):
+            if section is not None:
+                yield section
+            key = line.rstrip()[1:-1]
+            deleted = key.startswith("-")
+            section = RegSection(key.lstrip("-"), deleted, [], [])
+            continue
+
+        if section is None:
+            # The header, or a value outside any key
+            continue
+
+        parsed = parse_value(line)
+        if parsed is None:
+            continue
+
+        name, data, type_ = parsed
+        if type_ is None:
+            section.deleted_values.append(name)
+        else:
+            section.values.append((name, data, type_))
+
+    if section is not None:
+        yield section
+
+
+def iter_sections(
+    path: Union[str, pathlib.Path],
+    encoding: Optional[str] = None,
+) -> Iterator[RegSection]:
+    for f in _iter_binary_files(path):
+        # Buffered files (and gzip and zip's) can peek without seeking.
+        encoding_ = encoding or _detect_encoding(f.peek(4)[:4])  # type: ignore[union-attr]
+        lines = io.TextIOWrapper(f, encoding=encoding_, errors="replace", newline="")
+        yield from iter_sections_from_lines(lines)
+
+
+def escape(str_: str) -> str:
+    return str_.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def encode_hex(type_: int, data: Any) -> bytes:
+    """The inverse of decode_hex."""
+    if data is None:
+        return b""
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if type_ in (REG_SZ, REG_EXPAND_SZ) or isinstance(data, str):
+        return f"{data}\0".encode(ENCODING)
+    if type_ == REG_MULTI_SZ or isinstance(data, list):
+        return "".join(f"{str_}\0" for str_ in [*data, ""]).encode(ENCODING)
+    if isinstance(data, int):
+        return data.to_bytes(8 if type_ == REG_QWORD else 4, "little")
+    raise RegFileError(f"Cannot encode Registry data: {data!r} of type: {type_}")
+
+
+def _format_hex(prefix: str, raw: bytes) -> str:
+    lines = []
+    line = prefix
+    last = len(raw) - 1
+    for i, byte in enumerate(raw):
+        item = f"{byte:02x}" if i == last else f"{byte:02x},"
+        # Leave room for the continuation's "\".
+        if len(line) + len(item) > MAX_LINE_LENGTH - (0 if i == last else 1) - 1:
+            lines.append(f"{line}\\")
+            line = "  "
+        line += item
+    lines.append(line)
+    return NEWLINE.join(lines)
+
+
+def format_value(name: str, data: Any, type_: int) -> str:
+    quoted_name = "@" if name == "" else f'"{escape(name)}"'
+
+    if type_ == REG_SZ and isinstance(data, str):
+        return f'{quoted_name}="{escape(data)}"'
+
+    if type_ == REG_DWORD and isinstance(data, int):
+        return f"{quoted_name}=dword:{data:08x}"
+
+    raw = encode_hex(type_, data)
+
+    if type_ == REG_BINARY:
+        return _format_hex(f"{quoted_name}=hex:", raw)
+
+    return _format_hex(f"{quoted_name}=hex({type_:x}):", raw)
+
+
+def format_section(key: str, values: Iterable[ValueTriple]) -> str:
+    """key includes the root's full name, e.g. HKEY_LOCAL_MACHINE\\SOFTWARE.
+    Ends with the blank line that separates sections."""
+    lines = [f"[{key}]"]
+    lines.extend(format_value(name, data, type_) for name, data, type_ in values)
+    lines.extend(["", ""])
+    return NEWLINE.join(lines)
+
+
+def header() -> str:
+    """To start a new file with, after the BOM."""
+    return f"{HEADER}{NEWLINE}{NEWLINE}"
+
+
+# (key, byte offset of its section, byte length of its section)
+IndexEntry = tuple[str, int, int]
+
+
+class RegFileWriter:
+    """Writes a .reg file (from the BOM and header on) to a binary file,
+    recording the byte offset and length of each key's section."""
+
+    def __init__(self, f: IO[bytes]):
+        self.f = f
+        self.offset = 0
+        self.index: list[IndexEntry] = []
+        self._write(BOM + header())
+
+    def _write(self, text: str) -> int:
+        data = text.encode(ENCODING)
+        self.f.write(data)
+        self.offset += len(data)
+        return len(data)
+
+    def write_section(self, key: str, values: Iterable[ValueTriple]) -> None:
+        offset = self.offset
+        length = self._write(format_section(key, values))
+        self.index.append((key, offset, length))
+
+    def write_raw_section(self, key: str, data: bytes) -> None:
+        """data is a whole section, already encoded (e.g. copied from
+        another file written by a RegFileWriter)."""
+        self.f.write(data)
+        self.index.append((key, self.offset, len(data)))
+        self.offset += len(data)
+
+    def write_sections(self, sections: Iterable[RegSection]) -> None:
+        for section in sections:
+            self.write_section(section.key, section.values)
+
+
+def ancestors_first(key: str) -> tuple[str, ...]:
+    """Sort key, ordering every key after its ancestors (and
+    case insensitively, as the Registry is)."""
+    return tuple(key.lower().split("\\"))
+
+
+def first_sections(sections: Iterable[RegSection]) -> Iterator[RegSection]:
+    """Only the first section of each key, e.g. from the earliest backup
+    of it.  Streamed, so only the keys seen so far are held in memory."""
+    seen: set[str] = set()
+    for section in sections:
+        key = section.key.lower()
+        if key not in seen:
+            seen.add(key)
+            yield section
+
+
+def in_order(index: Iterable[IndexEntry]) -> bool:
+    """Whether the index has no duplicate keys, and every key is after
+    its ancestors."""
+    previous: Optional[tuple[str, ...]] = None
+    for key, __, __ in index:
+        sort_key = ancestors_first(key)
+        if previous is not None and sort_key <= previous:
+            return False
+        previous = sort_key
+    return True
+
+
+def sorted_index(index: Iterable[IndexEntry]) -> list[IndexEntry]:
+    """Only the first entry of each key, with every key after its
+    ancestors.  Only the keys and their offsets, not their values."""
+    first_entries: dict[str, IndexEntry] = {}
+    for entry in index:
+        first_entries.setdefault(entry[0].lower(), entry)
+    return sorted(first_entries.values(), key=lambda entry: ancestors_first(entry[0]))
+
+
+def sort_file(path: pathlib.Path, index: Iterable[IndexEntry]) -> list[IndexEntry]:
+    """Rewrites the (uncompressed) .reg file at path, written by a
+    RegFileWriter with index, in sorted_index's order.  Each section is
+    copied as it was written, by seeking to it, one at a time.  Returns
+    the new file's index."""
+    entries = sorted_index(index)
+
+    tmp_path = path.with_suffix(".tmp")
+    with path.open("rb") as f_r, tmp_path.open("wb", buffering=BUFFER_SIZE) as f_w:
+        writer = RegFileWriter(f_w)
+        for key, offset, length in entries:
+            f_r.seek(offset)
+            writer.write_raw_section(key, f_r.read(length))
+    tmp_path.replace(path)
+
+    return writer.index
+
+
+def compress(path: pathlib.Path, compression: str) -> pathlib.Path:
+    """Streams path into a gzip (path.gz) or zip (path with a .zip suffix)
+    file, deletes path, and returns the new file's path."""
+    if compression == "gzip":
+        compressed = path.with_name(f"{path.name}.gz")
+        with path.open("rb") as f_r, gzip.open(compressed, "wb") as f_w:
+            shutil.copyfileobj(f_r, f_w, BUFFER_SIZE)
+    elif compression == "zip":
+        compressed = path.with_suffix(".zip")
+        with zipfile.ZipFile(compressed, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            with path.open("rb") as f_r, zip_file.open(
+                path.name, "w", force_zip64=True
+            ) as f_w:
+                shutil.copyfileobj(f_r, f_w, BUFFER_SIZE)
+    else:
+        raise RegFileError(
+            f"Unsupported compression: {compression}.  Supported: {COMPRESSIONS}"
+        )
+
+    path.unlink()
+
+    return compressed
+
+
+def index_path(path: pathlib.Path) -> pathlib.Path:
+    """Of the index of the .reg (or compressed .reg) file at path."""
+    return path.with_name(f"{path.name}.index.json")
+
+
+def write_index(path: pathlib.Path, index: Iterable[IndexEntry]) -> pathlib.Path:
+    """Offsets are into the uncompressed .reg file."""
+    path_ = index_path(path)
+    with path_.open("wt", encoding="utf8") as f:
+        json.dump({"version": 1, "sections": list(index)}, f)
+    return path_
+
+
+def read_index(path: pathlib.Path) -> list[IndexEntry]:
+    """Raises an OSError if path has no index."""
+    with index_path(path).open("rt", encoding="utf8") as f:
+        return [tuple(entry) for entry in json.load(f)["sections"]]  # type: ignore[misc]
+
+
+def read_sections_at(
+    path: pathlib.Path,
+    entries: Iterable[IndexEntry],
+) -> Iterator[RegSection]:
+    """Reads only the given sections of path (from its index), seeking
+    straight to each one.  Compressed files are decompressed as far as
+    the last section, but nothing else is parsed."""
+    for f in _iter_binary_files(path):
+        # In file order, so a compressed file is only read forwards.
+        for __, offset, length in sorted(entries, key=lambda entry: entry[1]):
+            f.seek(offset)
+            text = f.read(length).decode(ENCODING, errors="replace")
+            yield from iter_sections_from_lines(text.splitlines(keepends=True))
+        return
@@ -1,14 +1,64 @@
-from typing import Iterator, Collection, Optional
+import copy
+import pathlib
+import functools
+from typing import Any, Callable, Iterator, Iterable, Collection, Optional, Union
+
+from . import (
+    backends,
+    reglib,
+    regfile,
+    stats,
+    incremental,
+    plan,
+    uninstallers,
+    output,
+)
+
+
+def _path_variable(key: reglib.ReadableKey) -> Optional[str]:
+    return next(key.names_of_path_env_variables(), None)
+
+
+def _record(
+    result: reglib.SearchResult,
+    matcher: reglib.TextMatcher,
+    path_variable: Optional[str],
+) -> dict[str, Any]:
+    key = result.key
+    matched_term = (
+        result.str_in_rel_key
+        or matcher.search(result.val_name)
+        or (result.val is not None and matcher.search_data(result.val))
+        or None
+    )
 
-from . import reglib
+    return dict(
+        key=str(key),
+        root=key.root_name if key.root is not None else None,
+        sid=key.sid,
+        matched_term=matched_term,
+        value_name=result.val_name,
+        value_type=(
+            None
+            if result.val_type is None
+            else backends.VALUE_TYPE_NAMES.get(result.val_type)
+        ),
+        path_variable=path_variable,
+    )
 
 
-def _pprint_result(result: reglib.SearchResult, prefix: str = ""):
+def _pprint_result(
+    result: reglib.SearchResult,
+    prefix: str = "",
+    path_variable: Optional[str] = None,
+):
+    """path_variable is the name of the key's first PATH like value,
+    found by the caller (so each key's values are only scanned once)."""
     key, display_name, val_name, val, vals, search_str = result
 
     print(f"{prefix}{display_name}", end="")
 
-    name_of_OS_path_data_entry_name = next(key.names_of_path_env_variables(), None)
+    name_of_OS_path_data_entry_name = path_variable
 
     if name_of_OS_path_data_entry_name is not None:
         print(
@@ -23,25 +73,26 @@ def _pprint_result(result: reglib.SearchResult, prefix: str = ""):
 
 
 def _matching_uninstallers(
-    search_terms: Collection[str],
-) -> Iterator[reglib.SearchResult]:
-    for uninstaller_key in reglib.uninstallers_keys:
-        yield from uninstaller_key.search_key_and_subkeys_for_text(
-            search_terms,
-            search_children_of_keys_containing_text=True,
-        )
+    search_terms: reglib.SearchTerms,
+) -> Iterator[uninstallers.Uninstaller]:
+    yield from uninstallers.get_index().matching(search_terms)
 
 
 class MatchingUninstallersFound(Exception):
     pass
 
 
-def check_uninstallers(search_terms: Collection[str]) -> None:
+def check_uninstallers(search_terms: reglib.SearchTerms) -> None:
     found = []
 
-    for result in _matching_uninstallers(search_terms):
-        found.append(result)
-        _pprint_result(prefix="Matching uninstaller: ", result=result)
+    for uninstaller in _matching_uninstallers(search_terms):
+        found.append(uninstaller)
+        print(
+            f"Matching uninstaller: {uninstaller.display_name or uninstaller.name}"
+            f"{f' by: {uninstaller.publisher}' if uninstaller.publisher else ''}"
+            f", at: {uninstaller.key}"
+            f"{f', run: {uninstaller.uninstall_string}' if uninstaller.uninstall_string else ''}"
+        )
 
     if found:
         raise MatchingUninstallersFound(
@@ -52,25 +103,296 @@ def check_uninstallers(search_terms: Collection[str]) -> None:
 global_root = reglib.GlobalRoot()
 
 
+class UserHives:
+    """The users' hives loaded in HKU (one sub key per SID, e.g. on
+    terminal servers), optionally only some of them, or all but some.
+
+    Used to prune other SIDs' hives from a walk, and, in per user mode,
+    to walk only HKU, with each user's hive in its own worker.
+    """
+
+    def __init__(self, sids: Iterable[str] = (), exclude_sids: Iterable[str] = ()):
+        self.sids = frozenset(sid.upper() for sid in sids)
+        self.exclude_sids = frozenset(sid.upper() for sid in exclude_sids)
+
+    def __bool__(self) -> bool:
+        return bool(self.sids or self.exclude_sids)
+
+    def wanted(self, sid: str) -> bool:
+        sid = sid.upper()
+        return (not self.sids or sid in self.sids) and sid not in self.exclude_sids
+
+    def __call__(self, key: reglib.ReadableKey) -> bool:
+        # Only the keys directly under HKU are pruned.
+        return (
+            key.root is reglib.Root.HKU
+            and bool(key.rel_key)
+            and "\\" not in key.rel_key
+            and not self.wanted(key.sid or "")
+        )
+
+    def find(self, backend: Optional[backends.RegistryBackend] = None) -> list[str]:
+        """The SIDs of the wanted users' hives that are loaded."""
+        hku = reglib.RootKey(reglib.Root.HKU, backend=backend)
+        return [
+            name
+            for name in hku.child_names()
+            if not name.lower().endswith("_classes") and self.wanted(name)
+        ]
+
+    def walk_from(
+        self,
+        max_depth: Optional[int] = None,
+        workers: int = 1,
+        ordered: bool = True,
+        engine_factory: Optional[Callable[[], reglib.TraversalEngine]] = None,
+    ) -> tuple[reglib.ReadableKey, Optional[int], reglib.ParallelWalker]:
+        """The key to walk HKU from, the max_depth from it (to reach the
+        same keys as from the global root), and a walker with one task
+        per hive (and by default, one worker per hive too)."""
+        if workers <= 1:
+            workers = max(1, min(len(self.find()), 32))
+
+        walker = reglib.ParallelWalker(
+            workers=workers,
+            split_depth=1,
+            ordered=ordered,
+            engine_factory=engine_factory,
+        )
+        return (
+            reglib.RootKey(reglib.Root.HKU),
+            None if max_depth is None else max_depth - 1,
+            walker,
+        )
+
+
+def _walker(
+    workers: int = 1,
+    ordered: bool = True,
+    split_depth: int = 2,
+    engine_factory: Optional[Callable[[], reglib.TraversalEngine]] = None,
+) -> Optional[reglib.ParallelWalker]:
+    if workers <= 1:
+        return None
+    return reglib.ParallelWalker(
+        workers=workers,
+        split_depth=split_depth,
+        ordered=ordered,
+        engine_factory=engine_factory,
+    )
+
+
+def _walk_from(
+    max_depth: Optional[int],
+    workers: int,
+    ordered: bool,
+    split_depth: int,
+    engine_factory: Callable[[], reglib.TraversalEngine],
+    per_user: bool,
+    user_hives: UserHives,
+) -> tuple[reglib.ReadableKey, Optional[int], Optional[reglib.ParallelWalker]]:
+    if per_user:
+        return user_hives.walk_from(max_depth, workers, ordered, engine_factory)
+    walker = _walker(workers, ordered, split_depth, engine_factory)
+    return global_root, max_depth, walker
+
+
+def _prune(
+    include_aliases: bool = False,
+    user_hives: Optional[UserHives] = None,
+    protected: bool = False,
+) -> Optional[Callable[[reglib.ReadableKey], bool]]:
+    predicates: list[Callable[[reglib.ReadableKey], bool]] = []
+    if not include_aliases:
+        # Walk HKLM, HKCU and HKU, but not the views of them.
+        predicates.append(reglib.RegistryAliases.find())
+    if user_hives:
+        predicates.append(user_hives)
+    if protected:
+        # Nothing in protected keys can be purged, so do not even read them.
+        predicates.append(reglib.ReadableKey.protected)
+
+    if len(predicates) <= 1:
+        return next(iter(predicates), None)
+    return lambda key: any(predicate(key) for predicate in predicates)
+
+
 def search_registry_for_text(
-    search_terms: Collection[str], max_depth: Optional[int] = 5
+    search_terms: reglib.SearchTerms,
+    max_depth: Optional[int] = 5,
+    walker: Optional[reglib.ParallelWalker] = None,
+    engine: Optional[reglib.TraversalEngine] = None,
+    include_aliases: bool = False,
+    key: Optional[reglib.ReadableKey] = None,
 ) -> Iterator[reglib.SearchResult]:
-    yield from global_root.search_key_and_subkeys_for_text(
-        search_terms, max_depth=max_depth
+    """Of key and its sub keys (by default, of the whole Registry).
+    Skips the views of other keys (e.g. HKCR), serially or with a
+    walker, unless include_aliases, an engine, or a walker's
+    engine_factory is given (whose engines are then used as made)."""
+    if not include_aliases:
+        if engine is None:
+            engine = reglib.TraversalEngine(prune=_prune())
+        if walker is not None and walker.engine_factory is None:
+            walker = copy.copy(walker)
+            walker.engine_factory = functools.partial(
+                reglib.TraversalEngine, access=walker.access, prune=_prune()
+            )
+
+    yield from (global_root if key is None else key).search_key_and_subkeys_for_text(
+        search_terms, max_depth=max_depth, walker=walker, engine=engine
     )
 
 
+def keys_in_reg_files(
+    reg_files: Iterable[Union[str, pathlib.Path]],
+    max_depth: Optional[int] = None,
+    value_types: Optional[Collection[int]] = None,
+) -> Iterator[reglib.ReadableKey]:
+    """Keys exported to .reg files (e.g. by reg export), in file order,
+    with their values read from the files, not from the Registry."""
+    for reg_file in reg_files:
+        for section in regfile.iter_sections(reg_file):
+            if section.deleted:
+                continue
+
+            # The same depths as a walk from the global root, which
+            # is depth 0, and the root keys, depth 1.
+            if max_depth is not None and section.key.count("\\") + 1 >= max_depth:
+                continue
+
+            run_stats = stats.current()
+            if run_stats is not None:
+                run_stats.add("keys visited")
+                run_stats.add("values read", len(section.values))
+
+            yield reglib.ReadableKey.from_str_and_values(
+                section.key, section.values, value_types
+            )
+
+
+def search_reg_files_for_text(
+    search_terms: reglib.SearchTerms,
+    reg_files: Iterable[Union[str, pathlib.Path]],
+    max_depth: Optional[int] = None,
+    value_types: Optional[Collection[int]] = None,
+) -> Iterator[reglib.SearchResult]:
+    search_terms = reglib.TextMatcher.from_strs(search_terms)
+    for key in keys_in_reg_files(reg_files, max_depth, value_types):
+        yield from key.search_for_text(search_terms)
+
+
 def search_registry(
     search_terms: Collection[str],
     max_depth: Optional[int] = None,
+    workers: int = 1,
+    ordered: bool = True,
+    split_depth: int = 2,
+    ignore_case: bool = False,
+    reg_files: Optional[Collection[Union[str, pathlib.Path]]] = None,
+    incremental_cache: Optional[Union[str, pathlib.Path]] = None,
+    plan_file: Optional[Union[str, pathlib.Path]] = None,
+    include_aliases: bool = False,
+    value_types: Optional[Collection[int]] = None,
+    format_: str = output.TEXT,
+    per_user: bool = False,
+    sids: Collection[str] = (),
+    exclude_sids: Collection[str] = (),
+    skip_protected: bool = False,
 ) -> None:
-    try:
-        check_uninstallers(search_terms)
-    except MatchingUninstallersFound as e:
-        print(
-            "\n################################################################################\n"
-            f"# {e.args[0]} #\n"
-            "################################################################################\n"
+    with output.records(format_, output.REGISTRY_FIELDS) as record_writer:
+        _search_registry(
+            search_terms,
+            max_depth,
+            workers,
+            ordered,
+            split_depth,
+            ignore_case,
+            reg_files,
+            incremental_cache,
+            plan_file,
+            include_aliases,
+            value_types,
+            record_writer,
+            per_user,
+            UserHives(sids, exclude_sids),
+            skip_protected,
+        )
+
+
+def _search_registry(
+    search_terms: Collection[str],
+    max_depth: Optional[int],
+    workers: int,
+    ordered: bool,
+    split_depth: int,
+    ignore_case: bool,
+    reg_files: Optional[Collection[Union[str, pathlib.Path]]],
+    incremental_cache: Optional[Union[str, pathlib.Path]],
+    plan_file: Optional[Union[str, pathlib.Path]],
+    include_aliases: bool,
+    value_types: Optional[Collection[int]],
+    record_writer: Optional[output.RecordWriter],
+    per_user: bool = False,
+    user_hives: Optional[UserHives] = None,
+    skip_protected: bool = False,
+) -> None:
+    matcher = reglib.TextMatcher(search_terms, case_insensitive=ignore_case)
+    user_hives = user_hives or UserHives()
+
+    cache = None
+
+    purge_plan = (
+        None
+        if plan_file is None
+        else plan.PurgePlan(search_terms, ignore_case=ignore_case)
+    )
+
+    if reg_files:
+        # Offline.  The files may not even be from this machine.
+        print(f"Searching .reg files: {list(map(str, reg_files))}")
+
+        results = search_reg_files_for_text(matcher, reg_files, max_depth, value_types)
+    else:
+        try:
+            check_uninstallers(matcher)
+        except MatchingUninstallersFound as e:
+            if purge_plan is not None:
+                purge_plan.uninstallers_found = True
+            print(
+                "\n################################################################################\n"
+                f"# {e.args[0]} #\n"
+                "################################################################################\n"
+            )
+
+        engine_factory: Callable[[], reglib.TraversalEngine]
+        prune = _prune(include_aliases, user_hives, skip_protected)
+
+        if incremental_cache is None:
+            engine_factory = functools.partial(
+                reglib.TraversalEngine, prune=prune, value_types=value_types
+            )
+        else:
+            cache = incremental.SearchCache(
+                pathlib.Path(incremental_cache), matcher, value_types
+            )
+            engine_factory = functools.partial(cache.engine, prune=prune)
+
+        key, key_max_depth, walker = _walk_from(
+            max_depth,
+            workers,
+            ordered,
+            split_depth,
+            engine_factory,
+            per_user,
+            user_hives,
+        )
+
+        results = search_registry_for_text(
+            matcher,
+            key_max_depth,
+            walker=walker,
+            engine=engine_factory(),
+            key=key,
         )
 
     print(
@@ -78,21 +400,49 @@ def search_registry(
         f'Rerun win_purge with "purge-registry" to delete the following registry keys (confirmation for each required): '
     )
 
-    for i, result in enumerate(search_registry_for_text(search_terms, max_depth)):
-        key, __, __, __, __, __ = result  # type: ignore
-        if key.contains_path_env_variable():
+    for i, result in enumerate(results):
+        path_variable = _path_variable(result.key)
+
+        if record_writer is not None:
+            record_writer.write(_record(result, matcher, path_variable))
+        elif path_variable is not None:
             _pprint_result(
-                prefix=f"{i}) Match found in System Path registry key: ", result=result
+                prefix=f"{i}) Match found in System Path registry key: ",
+                result=result,
+                path_variable=path_variable,
             )
         else:
             _pprint_result(prefix=f"{i}) Matching registry key: ", result=result)
 
+        if cache is not None:
+            cache.record_match(result)
+
+        if purge_plan is not None:
+            purge_plan.add(result)
+
+    # Only once the whole Registry has been searched.
+    if cache is not None:
+        cache.save()
+
+    if purge_plan is not None and plan_file is not None:
+        purge_plan.save(plan_file)
+        print(
+            f"Saved purge plan of {len(purge_plan.steps)} step(s) to: {plan_file}. "
+            f'Run win_purge "apply-plan {plan_file}" to apply it. '
+        )
+
     return None
 
 
 def _delete_values_or_keys_from_registry(
     search_terms: Collection[str],
     max_depth: Optional[int] = None,
+    walker: Optional[reglib.ParallelWalker] = None,
+    ignore_case: bool = False,
+    include_aliases: bool = False,
+    value_types: Optional[Collection[int]] = None,
+    key: Optional[reglib.ReadableKey] = None,
+    user_hives: Optional[UserHives] = None,
 ) -> None:
     if "" in search_terms:
         raise ValueError(
@@ -102,13 +452,29 @@ def _delete_values_or_keys_from_registry(
 
     print("WARNING!! Deleting the following Registry keys: ")
 
-    for i, result in enumerate(search_registry_for_text(search_terms, max_depth)):
+    matcher = reglib.TextMatcher(search_terms, case_insensitive=ignore_case)
+
+    # PATH entries have always been matched case insensitively.
+    path_matcher = reglib.TextMatcher(search_terms, case_insensitive=True)
+
+    engine = reglib.TraversalEngine(
+        prune=_prune(include_aliases, user_hives=user_hives),
+        value_types=value_types,
+    )
+
+    for i, result in enumerate(
+        search_registry_for_text(matcher, max_depth, walker, engine, key=key)
+    ):
         key, display_name, val_name, val, vals, search_str = result
 
+        names_of_path_env_variables = list(key.names_of_path_env_variables())
+        path_variable = next(iter(names_of_path_env_variables), None)
+
         if key.restricted():
             _pprint_result(
                 prefix=f"{i}) Cannot delete match found in restricted key: ",
                 result=result,
+                path_variable=path_variable,
             )
             continue
 
@@ -116,27 +482,29 @@ def _delete_values_or_keys_from_registry(
             _pprint_result(
                 prefix=f"{i}) Cannot delete match found in sub key of restricted root: ",
                 result=result,
+                path_variable=path_variable,
             )
             continue
 
-        names_of_path_env_variables = set(key.names_of_path_env_variables())
-
         if names_of_path_env_variables:
             _pprint_result(
-                prefix=f"{i}) Match found in System Path registry key: ", result=result
+                prefix=f"{i}) Match found in System Path registry key: ",
+                result=result,
+                path_variable=path_variable,
             )
 
             confirmation = ""
 
+            path_lists = reglib.path_lists()
+
             for path_val_name in names_of_path_env_variables:
-                system_paths = set(vals[path_val_name].split(";"))
-                matching_paths = {
-                    path
-                    for path in system_paths
-                    if any(str_.lower() in path.lower() for str_ in search_terms)
-                }
+                data = vals[path_val_name]
+                matching_paths = path_lists.matching(data, path_matcher)
+                if not matching_paths:
+                    continue
+
                 confirmation = input(
-                    f"Remove: {matching_paths} from registry key Path value? (y/n/quit) "
+                    f"Remove: {matching_paths} from registry key {path_val_name} value? (y/n/quit) "
                 )
 
                 if confirmation.lower().startswith("q"):
@@ -146,19 +514,49 @@ def _delete_values_or_keys_from_registry(
                     writeable_key = reglib.ReadAndWritableKey.from_key(key)
                     writeable_key.set_registry_value_data(
                         name=path_val_name,
-                        data=";".join(system_paths - matching_paths),
-                        type_=1,
+                        data=path_lists.without(data, matching_paths),
+                        # Keep REG_EXPAND_SZ paths expandable.
+                        type_=vals.types.get(path_val_name.lower(), backends.REG_SZ),
                     )
 
-        elif val_name or val:
+        # Other matching values, e.g. in a key with a PSModulePath too.
+        if val_name or val:
             key_with_deletable_values = (
                 reglib.KeyWithDeletableValueNamesAndValues.from_key(key)
             )
-            vals_and_names = set(
-                key_with_deletable_values.vals_or_val_names_containing(search_terms)
-            )
-            vals_and_names -= names_of_path_env_variables
+            path_lists = reglib.path_lists()
+            other_path_lists = set(key.names_of_other_path_lists())
+            # As searched (e.g. only values of the types searched).
+            vals_and_names = {
+                (val_name_i, val_i)
+                for val_name_i, val_i in key.vals_or_val_names_containing(matcher)
+                if val_name_i not in names_of_path_env_variables
+            }
             for val_name_i, val_i in vals_and_names:
+                # Only a list of paths that matched itself is edited, and
+                # only if some of its entries matched (not just its name).
+                matching_paths = (
+                    path_lists.matching(vals[val_name_i], path_matcher)
+                    if val_name_i in other_path_lists
+                    else []
+                )
+                if matching_paths:
+                    confirmation = input(
+                        f"Remove: {matching_paths} from registry key {key} value {val_name_i}? (y/n/quit) "
+                    )
+
+                    if confirmation.lower().startswith("q"):
+                        return
+
+                    if confirmation.lower() == "y":
+                        writeable_key = reglib.ReadAndWritableKey.from_key(key)
+                        writeable_key.set_registry_value_data(
+                            name=val_name_i,
+                            data=path_lists.without(vals[val_name_i], matching_paths),
+                            type_=vals.types.get(val_name_i.lower(), backends.REG_SZ),
+                        )
+                    continue
+
                 message = f"Remove value name/val: {val_name_i!r}/{val_i!r} from registry key: {key}? (y/n/quit/skip val name) "
 
                 confirmation = input(message)
@@ -171,7 +569,11 @@ def _delete_values_or_keys_from_registry(
                     key_with_deletable_values.delete_value_and_value_name(val_name_i)
 
         if search_str:
-            _pprint_result(prefix=f"{i}) Matching registry key: ", result=result)
+            _pprint_result(
+                prefix=f"{i}) Matching registry key: ",
+                result=result,
+                path_variable=path_variable,
+            )
 
             if not key.can_delete_subkeys_of_parents():
                 print(f"{i} Cannot delete sub keys of some parent of: {key}")
@@ -187,6 +589,112 @@ def _delete_values_or_keys_from_registry(
                 deletable_key.delete()
 
 
-def delete_values_or_keys_from_registry(search_terms: Collection[str]) -> None:
-    check_uninstallers(search_terms)
-    _delete_values_or_keys_from_registry(search_terms)
+def delete_values_or_keys_from_registry(
+    search_terms: Collection[str],
+    workers: int = 1,
+    ordered: bool = True,
+    split_depth: int = 2,
+    ignore_case: bool = False,
+    compress_backups: Optional[str] = None,
+    include_aliases: bool = False,
+    value_types: Optional[Collection[int]] = None,
+    per_user: bool = False,
+    sids: Collection[str] = (),
+    exclude_sids: Collection[str] = (),
+) -> None:
+    if compress_backups is not None:
+        reglib.InProcessKeyBackupMaker.get_shared_instance().compression = (
+            compress_backups
+        )
+
+    check_uninstallers(
+        reglib.TextMatcher(search_terms, case_insensitive=ignore_case)
+    )
+    user_hives = UserHives(sids, exclude_sids)
+
+    key, max_depth, walker = _walk_from(
+        None,
+        workers,
+        ordered,
+        split_depth,
+        functools.partial(
+            reglib.TraversalEngine,
+            prune=_prune(include_aliases, user_hives=user_hives),
+            value_types=value_types,
+        ),
+        per_user,
+        user_hives,
+    )
+
+    _delete_values_or_keys_from_registry(
+        search_terms,
+        max_depth=max_depth,
+        walker=walker,
+        ignore_case=ignore_case,
+        include_aliases=include_aliases,
+        value_types=value_types,
+        key=key,
+        user_hives=user_hives,
+    )
+
+
+def _describe(step: dict) -> str:
+    action, key = step["action"], step["key"]
+    if action == plan.DELETE_VALUES:
+        return f"delete values: {step['value_names']} from: {key}"
+    if action == plan.EDIT_PATH:
+        return f"remove: {step['remove']} from: {step['value_name']} in: {key}"
+    return f"delete key: {key}"
+
+
+def apply_purge_plans(
+    plan_files: Iterable[Union[str, pathlib.Path]],
+    dry_run: bool = False,
+) -> None:
+    for plan_file in plan_files:
+        purge_plan = plan.PurgePlan.load(plan_file)
+
+        print(
+            f"Applying purge plan: {plan_file}, made: {purge_plan.created}, "
+            f"for: {purge_plan.search_terms}"
+        )
+
+        if purge_plan.uninstallers_found:
+            raise MatchingUninstallersFound(
+                "Matching uninstaller(s) were found when the plan was made. "
+                "Run these uninstallers first before purging. "
+            )
+
+        # They may have been installed since.
+        check_uninstallers(purge_plan.matcher)
+
+        steps = []
+        for i, step in enumerate(purge_plan.steps):
+            if step["action"] == plan.SKIP:
+                print(f"{i}) Skipping ({step['reason']}): {step['key']}")
+                continue
+            reason = plan.validate(step)
+            if reason is not None:
+                print(f"{i}) Skipping ({reason}): {step['key']}")
+                continue
+            steps.append((i, step))
+
+        if dry_run:
+            for i, step in steps:
+                print(f"{i}) Would {_describe(step)}")
+            continue
+
+        # Back everything up, in one batch, before changing anything.
+        backup_maker = reglib.InProcessKeyBackupMaker.get_shared_instance()
+        with backup_maker.batch():
+            for __, step in steps:
+                backup_maker.backup_key(reglib.ReadableKey.from_str(step["key"]))
+
+        for i, step in steps:
+            try:
+                plan.apply(step)
+            except Exception as e:
+                # e.g. a key deleted by an earlier step (with its parent).
+                print(f"{i}) Failed to {_describe(step)}: {e}")
+                continue
+            print(f"{i}) Done: {_describe(step)}")
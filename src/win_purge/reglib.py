@@ -1,9 +1,12 @@
 from __future__ import annotations
 import os
+import sys
 import abc
+import ntpath
 from typing import (
     Self,
     Any,
+    BinaryIO,
     Iterator,
     Iterable,
     Hashable,
@@ -11,9 +14,10 @@ from typing import (
     Optional,
     Type,
     Collection,
+    TypeVar,
 )
-import winreg
 import enum
+import re
 import pathlib
 import collections
 import contextlib
@@ -22,9 +26,14 @@ import atexit
 import subprocess
 import tempfile
 import functools
+import threading
+import queue
+import concurrent.futures
 
 import send2trash  # type: ignore
 
+from . import backends, regfile, stats
+
 
 def getenv(name: str) -> str:
     # Convenience function for brevity and to pass type checking
@@ -35,14 +44,23 @@ PATH = getenv("PATH")
 
 APPDATA = pathlib.Path(getenv("APPDATA"))
 
+
+def app_data_dir() -> pathlib.Path:
+    """APPDATA, or if it is not set (e.g. off Windows), the temporary
+    directory, so that nothing is ever written relative to the
+    working directory."""
+    if APPDATA.is_absolute():
+        return APPDATA
+    return pathlib.Path(tempfile.gettempdir())
+
 ROOT_KEYS = {
-    winreg.HKEY_CLASSES_ROOT: "HKCR",
-    winreg.HKEY_CURRENT_CONFIG: "HKCC",
-    winreg.HKEY_CURRENT_USER: "HKCU",
-    winreg.HKEY_DYN_DATA: "HKDD",
-    winreg.HKEY_LOCAL_MACHINE: "HKLM",
-    winreg.HKEY_PERFORMANCE_DATA: "HKPD",
-    winreg.HKEY_USERS: "HKU",
+    backends.HKEY_CLASSES_ROOT: "HKCR",
+    backends.HKEY_CURRENT_CONFIG: "HKCC",
+    backends.HKEY_CURRENT_USER: "HKCU",
+    backends.HKEY_DYN_DATA: "HKDD",
+    backends.HKEY_LOCAL_MACHINE: "HKLM",
+    backends.HKEY_PERFORMANCE_DATA: "HKPD",
+    backends.HKEY_USERS: "HKU",
 }
 
 
@@ -60,7 +78,7 @@ class Root(enum.Enum):
         str_ = str_.upper()
 
         # Full name
-        if str_ in cls:
+        if str_ in cls._value2member_map_:
             return cls(str_)
 
         # Abbreviation
@@ -75,7 +93,7 @@ class Root(enum.Enum):
 
     @enum.property
     def HKEY_Const(self):
-        return getattr(winreg, self.value)
+        return getattr(backends, self.value)
 
 
 class CaseInsensitiveDict(dict):
@@ -95,16 +113,276 @@ class CaseInsensitiveDict(dict):
         super().__setitem__(k, v)
 
 
+class RegistryValues(CaseInsensitiveDict):
+    """A key's values' data, by name, and their types (by lower case
+    name, in .types)."""
+
+    def __init__(
+        self,
+        items: Iterable[tuple[Hashable, Any]] = [],
+        types: Optional[dict[str, int]] = None,
+    ):
+        super().__init__(items)
+        self.types = {} if types is None else types
+
+
+class FilteredValues(RegistryValues):
+    """A key's values, as read for a search of only some value types.
+
+    The others' names are in .unsearched (in lower case).  Their names
+    are searched, but not their data, which is None until the key
+    matches and its values are read again, .complete.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[tuple[Hashable, Any]] = [],
+        types: Optional[dict[str, int]] = None,
+        unsearched: Iterable[str] = (),
+        complete: bool = False,
+    ):
+        super().__init__(items, types)
+        self.unsearched = set(unsearched)
+        self.complete = complete
+
+
+class TextMatcher:
+    """All the search terms, compiled once per search into a single
+    regex, so each string is scanned in one pass for every term,
+    instead of once per term.
+
+    .search returns the term that matched (as it was given), or None.
+    If more than one term matches, the leftmost (then longest) wins.
+    """
+
+    def __init__(self, strs: Iterable[str], case_insensitive: bool = False):
+        if isinstance(strs, str):
+            strs = [strs]
+
+        self.strs = tuple(dict.fromkeys(strs))
+        self.case_insensitive = case_insensitive
+
+        self._strs_by_match: dict[str, str] = {}
+        for str_ in self.strs:
+            self._strs_by_match.setdefault(self._normalise(str_), str_)
+
+        # Longest first, so that where one term is a prefix of
+        # another, the longer term is reported.
+        pattern = "|".join(
+            re.escape(str_) for str_ in sorted(self.strs, key=len, reverse=True)
+        )
+        flags = re.IGNORECASE if case_insensitive else 0
+        self._regex = re.compile(pattern, flags) if self.strs else None
+
+    @classmethod
+    def from_strs(cls, strs: SearchTerms) -> TextMatcher:
+        if isinstance(strs, TextMatcher):
+            return strs
+        return cls(strs)
+
+    def _normalise(self, str_: str) -> str:
+        return str_.lower() if self.case_insensitive else str_
+
+    def search(self, text: str) -> Optional[str]:
+        if self._regex is None:
+            return None
+
+        run_stats = stats.current()
+        if run_stats is None:
+            match = self._regex.search(text)
+        else:
+            with run_stats.timed("match"):
+                match = self._regex.search(text)
+
+        if match is None:
+            return None
+        return self._strs_by_match[self._normalise(match.group(0))]
+
+    def __call__(self, text: str) -> bool:
+        return self.search(text) is not None
+
+    @functools.cached_property
+    def _data_regex(self) -> tuple[Optional[re.Pattern[bytes]], list[str]]:
+        # Each term as a string would be stored in binary data: in
+        # UTF-16LE (as Windows stores them), or in UTF-8 (or ASCII).
+        # One group per term per encoding, longest term first.
+        alternatives = []
+        strs_by_group = []
+        for str_ in sorted(self.strs, key=len, reverse=True):
+            for encoding in ("utf-16-le", "utf-8"):
+                alternatives.append(b"(%s)" % re.escape(str_.encode(encoding)))
+                strs_by_group.append(str_)
+
+        flags = re.IGNORECASE if self.case_insensitive else 0
+        regex = re.compile(b"|".join(alternatives), flags) if alternatives else None
+        return regex, strs_by_group
+
+    def search_data(self, data: Any) -> Optional[str]:
+        """Searches binary data for the terms' bytes (so case insensitive
+        only for ASCII letters), instead of its repr.  Other data is
+        searched as a str."""
+        if not isinstance(data, (bytes, bytearray)):
+            return self.search(str(data))
+
+        regex, strs_by_group = self._data_regex
+        if regex is None:
+            return None
+
+        run_stats = stats.current()
+        if run_stats is None:
+            match = regex.search(data)
+        else:
+            with run_stats.timed("match"):
+                match = regex.search(data)
+
+        if match is None:
+            return None
+        return strs_by_group[match.lastindex - 1]  # type: ignore[operator]
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({list(self.strs)}, "
+            f"case_insensitive={self.case_insensitive})"
+        )
+
+
+SearchTerms = Collection[str] | TextMatcher
+
+
+class PathLists:
+    """Recognises values that are lists of paths (e.g. Path, PSModulePath),
+    whose matching entries are removed, instead of the whole value.
+
+    PATH's entries are expanded and normalised once, so each value is
+    compared with a set, instead of entry by entry.  Verdicts are cached
+    by value name and data (so are still right after a value is edited).
+    """
+
+    # Always lists, even if their entries are not all absolute paths.
+    list_names = frozenset({"path", "pathext", "psmodulepath"})
+
+    max_cached = 4096
+
+    def __init__(self, path: str = PATH):
+        self.path_entries = frozenset(
+            filter(None, map(self.normalise, self.split(path)))
+        )
+        self._verdicts: dict[tuple[str, str], tuple[bool, bool]] = {}
+
+    @staticmethod
+    def split(data: str) -> list[str]:
+        return data.split(";")
+
+    @staticmethod
+    def expand(entry: str) -> str:
+        # %VARS%, as in REG_EXPAND_SZ values, on any OS.
+        return ntpath.expandvars(entry)
+
+    @classmethod
+    def normalise(cls, entry: str) -> str:
+        return cls.expand(entry).strip().rstrip("\\/").lower()
+
+    def _verdict(self, name: str, data: str) -> tuple[bool, bool]:
+        # (Is a list of paths, Is the system's or a user's Path)
+        entries = [entry for entry in self.split(data) if entry.strip()]
+        if not entries:
+            return False, False
+
+        # In cmd, %PATH% is the system's Path followed by the user's.
+        if name == "path" and all(
+            self.normalise(entry) in self.path_entries for entry in entries
+        ):
+            return True, True
+
+        if name in self.list_names:
+            return True, False
+
+        return (
+            len(entries) > 1
+            and all(ntpath.isabs(self.expand(entry)) for entry in entries),
+            False,
+        )
+
+    def verdict(self, name: str, data: Any) -> tuple[bool, bool]:
+        if not isinstance(data, str) or not data:
+            return False, False
+
+        name = name.lower()
+        if name not in self.list_names and ";" not in data:
+            return False, False
+
+        cache_key = (name, data)
+        verdict = self._verdicts.get(cache_key)
+        if verdict is None:
+            verdict = self._verdict(name, data)
+            if len(self._verdicts) < self.max_cached:
+                self._verdicts[cache_key] = verdict
+        return verdict
+
+    def is_path_list(self, name: str, data: Any) -> bool:
+        return self.verdict(name, data)[0]
+
+    def is_env_path(self, name: str, data: Any) -> bool:
+        return self.verdict(name, data)[1]
+
+    def matching(self, data: str, matcher: Callable[[str], Any]) -> list[str]:
+        """Entries matched by matcher, as written, or once expanded."""
+        return list(
+            dict.fromkeys(
+                entry
+                for entry in self.split(data)
+                if entry and (matcher(entry) or matcher(self.expand(entry)))
+            )
+        )
+
+    def without(self, data: str, entries: Iterable[str]) -> str:
+        """data, in the same order, without any of entries."""
+        remove = set(entries)
+        return ";".join(entry for entry in self.split(data) if entry not in remove)
+
+
+@functools.cache
+def path_lists() -> PathLists:
+    """From PATH, once per run."""
+    return PathLists()
+
+
 class KeyBackupMaker(abc.ABC):
     def __init__(self):
         atexit.register(self.consolidate_tmp_backups)
 
+        # Lower case names of the keys backed up this session.
+        self.covered: set[str] = set()
+
     @classmethod
     @abc.abstractmethod
     def make_tmp_backup_of_registry_key(cls, name: str):
         pass
 
-    def consolidate_tmp_backups(self, dir_: Optional[pathlib.Path]) -> None:
+    def is_covered(self, name: str) -> bool:
+        """Whether name's data is already backed up, in an earlier backup
+        of the key itself, or of one of its ancestors (if they were
+        backed up with their sub keys).  Only the earliest backup is needed
+        to restore a key, so any later ones are redundant."""
+        name = name.lower()
+        if name in self.covered:
+            return True
+        if not self.backs_up_sub_keys_too:
+            return False
+        parts = name.split("\\")
+        return any(
+            "\\".join(parts[:i]) in self.covered for i in range(1, len(parts))
+        )
+
+    def backup_key(self, key: ReadableKey) -> None:
+        # Overridable, e.g. to back up key from its own backend.
+        name = str(key)
+        if self.is_covered(name):
+            return
+        self.make_tmp_backup_of_registry_key(name)
+        self.covered.add(name.lower())
+
+    def consolidate_tmp_backups(self, dir_: Optional[pathlib.Path] = None) -> None:
         pass
 
     backs_up_sub_keys_too = False
@@ -125,6 +403,20 @@ class CmdKeyBackupMaker(KeyBackupMaker):
 
     backup_file_pattern = f"{prefix}%s{ext}"
 
+    # Of consolidated backups, e.g. deleted_and_modified_keys_0.reg.gz
+    suffixes = (ext, f"{ext}.gz", ".zip")
+
+    # Each directory's next unused index is saved in this file...
+    index_file_name = ".next_index"
+
+    # ... and cached in this process.
+    _next_indices: dict[pathlib.Path, int] = {}
+
+    _indices_lock = threading.Lock()
+
+    # None, or one of regfile.COMPRESSIONS
+    compression: Optional[str] = None
+
     backs_up_sub_keys_too = True
 
     _shared_instance: Optional[Self] = None
@@ -135,15 +427,44 @@ class CmdKeyBackupMaker(KeyBackupMaker):
         return cls._shared_instance
 
     @classmethod
-    def get_unused_path(cls, dir_: pathlib.Path) -> pathlib.Path:
-        i = 0
+    def _index(cls, path: pathlib.Path) -> int:
+        return int(path.name.removeprefix(cls.prefix).partition(".")[0])
+
+    @classmethod
+    def _first_unused_index(cls, dir_: pathlib.Path) -> int:
+        try:
+            return int((dir_ / cls.index_file_name).read_text())
+        except (OSError, ValueError):
+            pass
+
+        # No index file yet (e.g. the backups were made by an older
+        # version), so scan the directory, once.
+        indices = []
+        for path in dir_.glob(f"{cls.prefix}*"):
+            with contextlib.suppress(ValueError):
+                indices.append(cls._index(path))
+        return max(indices, default=-1) + 1
 
-        while True:
-            path = dir_ / (cls.backup_file_pattern % i)
-            if path.exists():
+    @classmethod
+    def get_unused_path(cls, dir_: pathlib.Path) -> pathlib.Path:
+        """Numbers the backups in dir_ in sequence, so usually only
+        one name needs to be checked, however many backups there are."""
+        with cls._indices_lock:
+            i = cls._next_indices.get(dir_)
+            if i is None:
+                i = cls._first_unused_index(dir_)
+
+            # In case another process has used it.
+            while any(
+                (dir_ / f"{cls.prefix}{i}{suffix}").exists() for suffix in cls.suffixes
+            ):
                 i += 1
-                continue
-            return path
+
+            cls._next_indices[dir_] = i + 1
+            with contextlib.suppress(OSError):
+                (dir_ / cls.index_file_name).write_text(str(i + 1))
+
+            return dir_ / (cls.backup_file_pattern % i)
 
     @staticmethod
     def _backup_registry_key(name_inc_root: str, path: pathlib.Path) -> None:
@@ -163,7 +484,12 @@ class CmdKeyBackupMaker(KeyBackupMaker):
 
         tmp_file = cls.get_unused_path(dir_)
 
-        cls._backup_registry_key(name, tmp_file)
+        run_stats = stats.current()
+        if run_stats is None:
+            cls._backup_registry_key(name, tmp_file)
+        else:
+            with run_stats.timed("reg export"):
+                cls._backup_registry_key(name, tmp_file)
 
         cls.tmp_backups[dir_].add(tmp_file)
 
@@ -175,7 +501,9 @@ class CmdKeyBackupMaker(KeyBackupMaker):
     ) -> None:
         if dir_ is None:
             if self.backups_dir is None:
-                self.backups_dir = APPDATA / self.app_folder_name / "registry_backups"
+                self.backups_dir = (
+                    app_data_dir() / self.app_folder_name / "registry_backups"
+                )
                 self.backups_dir.mkdir(exist_ok=True, parents=True)
             dir_ = self.backups_dir
 
@@ -188,36 +516,947 @@ class CmdKeyBackupMaker(KeyBackupMaker):
                 warnings.warn(f"Also consolidating {previous_tmp_backups=}")
                 tmp_backups |= previous_tmp_backups
 
+            if not tmp_backups:
+                continue
+
+            # In the order they were made, so that only the earliest backup
+            # of each key is kept (later ones may include changes made by
+            # this session).
+            sections = regfile.first_sections(
+                section
+                for tmp_backup in sorted(tmp_backups, key=self._index)
+                for section in regfile.iter_sections(tmp_backup)
+            )
+
             backups_file = self.get_unused_path(dir_)
 
-            header_written = False
+            with backups_file.open("wb", buffering=regfile.BUFFER_SIZE) as f_w:
+                writer = regfile.RegFileWriter(f_w)
+                writer.write_sections(sections)
+
+            index = writer.index
+
+            # So that parents are written before their children.
+            if not regfile.in_order(index):
+                index = regfile.sort_file(backups_file, index)
+
+            if self.compression is not None:
+                backups_file = regfile.compress(backups_file, self.compression)
+
+            regfile.write_index(backups_file, index)
+
+            for tmp_backup in tmp_backups:
+                send2trash.send2trash(tmp_backup)
+
+            tmp_backups.clear()
+
+
+class InProcessKeyBackupMaker(KeyBackupMaker):
+    """Backs up keys and all their sub keys in the same .reg format as
+    reg export (so they can be restored with reg import), without
+    starting a reg export subprocess for each key.  Keys are read with a
+    TraversalEngine, through their own backend.
+
+    Every backup in the session is appended to the same file, which is
+    only opened once, and flushed after each backup so that it is saved
+    before the key is changed.  Keys already covered by an earlier backup
+    are skipped, so each key is only written once, and if that leaves
+    any children before their parents, the file is sorted when it is
+    consolidated.
+    """
+
+    prefix = CmdKeyBackupMaker.prefix
+
+    ext = CmdKeyBackupMaker.ext
+
+    app_folder_name = CmdKeyBackupMaker.app_folder_name
+
+    backup_file_pattern = CmdKeyBackupMaker.backup_file_pattern
 
-            with backups_file.open("at", encoding="utf16") as f_w:
-                # Sort and Reverse for readability, so that parents appear before children.
-                # Order is most recent first (children backed up before parents), e.g.:
-                # deleted_and_modified_keys_9.reg, ..., deleted_and_modified_keys_0.reg
-                for tmp_backup in reversed(sorted(tmp_backups)):
-                    with tmp_backup.open("rt", encoding="utf16") as f_r:
-                        for line in f_r:
-                            if line.startswith("Windows Registry Editor "):
-                                if header_written:
-                                    continue
-                                else:
-                                    header_written = True
-                            f_w.write(f"{line}\n")
+    # None, or one of regfile.COMPRESSIONS
+    compression: Optional[str] = None
 
-                    send2trash.send2trash(tmp_backup)
+    backs_up_sub_keys_too = True
+
+    _shared_instance: Optional[Self] = None
+
+    def __init__(self, backups_dir: Optional[pathlib.Path] = None):
+        super().__init__()
+        self.backups_dir = backups_dir
+        self.path: Optional[pathlib.Path] = None
+        self._file: Optional[BinaryIO] = None
+        self._writer: Optional[regfile.RegFileWriter] = None
+        self._lock = threading.Lock()
+        self._needs_sorting = False
+        self._batching = False
+
+    @classmethod
+    def get_shared_instance(cls) -> Self:
+        cls._shared_instance = cls._shared_instance or cls()
+        return cls._shared_instance
+
+    def _stream(self) -> regfile.RegFileWriter:
+        if self._writer is None:
+            if self.backups_dir is None:
+                self.backups_dir = (
+                    app_data_dir() / self.app_folder_name / "registry_backups"
+                )
+            self.backups_dir.mkdir(exist_ok=True, parents=True)
+            self.path = CmdKeyBackupMaker.get_unused_path(self.backups_dir)
+            self._file = self.path.open("wb", buffering=regfile.BUFFER_SIZE)
+            self._writer = regfile.RegFileWriter(self._file)
+        return self._writer
+
+    def backup_key(self, key: ReadableKey) -> None:
+        run_stats = stats.current()
+
+        with self._lock, contextlib.ExitStack() as stack:
+            name = str(key)
+            if self.is_covered(name):
+                if run_stats is not None:
+                    run_stats.add("redundant backups skipped")
+                return
+
+            if run_stats is not None:
+                stack.enter_context(run_stats.timed("reg file backup"))
+
+            writer = self._stream()
+            # Descendants backed up earlier are already in the file.
+            engine = RegFileTraversalEngine(writer.write_section, skip=self.covered)
+            for __ in engine.walk(key, max_depth=None):
+                pass
+            if not self._batching:
+                writer.f.flush()
+
+            if engine.skipped:
+                self._needs_sorting = True
+                self.covered -= engine.skipped
+
+            self.covered.add(name.lower())
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Flushes the backups made in the with block only once, at the
+        end, so the keys must not be changed until after it."""
+        self._batching = True
+        try:
+            yield
+        finally:
+            self._batching = False
+            with self._lock:
+                if self._file is not None:
+                    self._file.flush()
+
+    def make_tmp_backup_of_registry_key(self, name: str) -> None:  # type: ignore[override]
+        self.backup_key(ReadableKey.from_str(name))
+
+    def consolidate_tmp_backups(self, dir_: Optional[pathlib.Path] = None) -> None:
+        # Everything is already in one file.
+        with self._lock:
+            if self._file is None or self._writer is None or self.path is None:
+                return
+
+            self._file.close()
+            self._file = None
+            index = self._writer.index
+            self._writer = None
+
+            if self._needs_sorting:
+                index = self._sort(index)
+
+            if self.compression is not None:
+                self.path = regfile.compress(self.path, self.compression)
+
+            regfile.write_index(self.path, index)
+
+    def _sort(self, index: list[regfile.IndexEntry]) -> list[regfile.IndexEntry]:
+        assert self.path is not None
+        index = regfile.sort_file(self.path, index)
+        self._needs_sorting = False
+        return index
+
+
+class KeyPathTrie:
+    """Key paths, e.g. HKLM\\SOFTWARE\\Acme, stored component by component
+    (case insensitively), to look up whether a key is under any of them
+    in O(depth), however many there are."""
+
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: dict[str, KeyPathTrie] = {}
+        self.terminal = False
+
+    @staticmethod
+    def _components(path: str) -> list[str]:
+        return [part for part in path.lower().split("\\") if part]
+
+    def add(self, path: str) -> None:
+        node = self
+        for part in self._components(path):
+            node = node.children.setdefault(part, KeyPathTrie())
+        node.terminal = True
+
+    def covers(self, path: str) -> bool:
+        """Whether path, or any of its ancestors, has been added."""
+        node = self
+        for part in self._components(path):
+            if node.terminal:
+                return True
+            child = node.children.get(part)
+            if child is None:
+                return False
+            node = child
+        return node.terminal
+
+    def __len__(self) -> int:
+        return self.terminal + sum(len(child) for child in self.children.values())
+
+
+class KeyPolicies:
+    """Which keys must not be altered or deleted (each with all its sub
+    keys), as KeyPathTries of each key's root's abbreviation and rel_key.
+
+    Extra keys can be loaded from files like:
+
+        # Comments start with # or ;
+        [restricted]
+        HKLM\\SOFTWARE\\Acme\\Licence
+        [do_not_alter_subkeys_of]
+        HKEY_CURRENT_CONFIG
+        [do_not_delete_subkeys_of]
+        HKCU\\Software\\Policies
+    """
+
+    categories = ("restricted", "do_not_alter_subkeys_of", "do_not_delete_subkeys_of")
+
+    def __init__(self):
+        self.tries = {category: KeyPathTrie() for category in self.categories}
+
+    def add(self, category: str, root: Root, rel_key: str) -> None:
+        if category not in self.tries:
+            raise Exception(
+                f"Unknown key policy: {category}.  Must be one of: {self.categories}"
+            )
+        self.tries[category].add(f"{root.name}\\{rel_key}")
+
+    def add_dict(self, category: str, rel_keys: dict[Root, list[str]]) -> None:
+        for root, rel_keys_ in rel_keys.items():
+            for rel_key in rel_keys_:
+                self.add(category, root, rel_key)
+
+    def load(self, path: pathlib.Path) -> None:
+        category = None
+        with open(path, "rt", encoding="utf8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith(("#", ";")):
+                    continue
+                if line.startswith("[") and line.endswith("]"):
+                    category = line[1:-1].strip()
+                    if category not in self.tries:
+                        raise Exception(
+                            f"Unknown key policy: {category} at: {path}:{line_no}.  "
+                            f"Must be one of: {self.categories}"
+                        )
+                    continue
+                if category is None:
+                    raise Exception(
+                        f"Key: {line} is not under any [policy] at: {path}:{line_no}"
+                    )
+                root_name, __, rel_key = line.partition("\\")
+                self.add(category, Root.from_str(root_name), rel_key)
+
+    def covers(self, category: str, root: Optional[Root], rel_key: str) -> bool:
+        if root is None:
+            return False
+        return self.tries[category].covers(f"{root.name}\\{rel_key}")
 
 
 class NoRootError(Exception):
     pass
 
 
+ValueTriple = backends.ValueTriple
+
+
+# Walk orders
+POST_ORDER = "post"  # Bottom-Up, children before their parents (the default)
+PRE_ORDER = "pre"  # Top-Down, parents before their children
+BREADTH_FIRST = "bfs"  # Level by level
+
+WALK_ORDERS = (POST_ORDER, PRE_ORDER, BREADTH_FIRST)
+
+
+class _Frame:
+    # One level of a depth first walk.
+    __slots__ = (
+        "key",
+        "handle",
+        "parent_handle",
+        "name",
+        "child_depth",
+        "children",
+        "next_child",
+    )
+
+    def __init__(
+        self,
+        key: ReadableKey,
+        handle: Optional[backends.Handle],
+        parent_handle: Optional[backends.Handle],
+        name: str,
+        child_depth: Optional[int],
+    ):
+        self.key = key
+        self.handle = handle
+        self.parent_handle = parent_handle
+        self.name = name
+        self.child_depth = child_depth
+        # Child names (or RootKeys, for GlobalRoot), not yet keys.
+        self.children: list = []
+        self.next_child = 0
+
+
+class TraversalEngine:
+    """Walks a key and its sub keys, opening each key exactly once,
+    relative to its parent's already open handle.  Sub key names and
+    values are both enumerated from that one handle, and cached on
+    the yielded key objects, so searching them needs no further calls
+    to open them.
+
+    A key's handle is closed as soon as its children have been walked
+    (or as soon as the walk is abandoned), so at most max_depth handles
+    are open at once.  .open_handles counts the handles currently open,
+    and .handles_opened counts every handle the engine has opened.
+
+    The walk is iterative, from an explicit stack with one frame per
+    level, each holding only its key's handle and its child names (a
+    child's key object is only made when the walk reaches it).  So its
+    memory is bounded by the depth times the widest key's number of sub
+    keys, not by the size of the tree.  .peak_stack_depth and
+    .peak_pending_keys (child names held, not yet walked) record the
+    most the engine has needed at once.
+    """
+
+    def __init__(
+        self,
+        access: int = backends.KEY_READ,
+        read_values: bool = True,
+        prune: Optional[Callable[[ReadableKey], bool]] = None,
+        value_types: Optional[Collection[int]] = None,
+    ):
+        self.access = access
+        self.read_values = read_values
+        # Keys for which this returns True are not even opened,
+        # nor are any of their sub keys.
+        self.prune = prune
+        # If given, only the data of values of these types (e.g.
+        # backends.REG_SZ) is read (see FilteredValues).
+        self.value_types = value_types
+        self.open_handles = 0
+        self.handles_opened = 0
+        self.peak_stack_depth = 0
+        self.peak_pending_keys = 0
+        self._pending = 0
+
+    def _open(
+        self,
+        key: ReadableKey,
+        parent_handle: Optional[backends.Handle] = None,
+        name: str = "",
+    ) -> backends.Handle:
+        if parent_handle is None:
+            handle = key.backend.open_key(key.HKEY_Const, key.rel_key, self.access)
+        else:
+            handle = key.backend.open_key(parent_handle, name, self.access)
+        self.open_handles += 1
+        self.handles_opened += 1
+        return handle
+
+    def _close(self, key: ReadableKey, handle: backends.Handle) -> None:
+        key.backend.close(handle)
+        self.open_handles -= 1
+
+    @staticmethod
+    def _enumerate(
+        backend: backends.RegistryBackend,
+        handle: backends.Handle,
+        read_values: bool = True,
+        value_types: Optional[Collection[int]] = None,
+    ) -> tuple[list[str], list[ValueTriple]]:
+        # Enumerate and store all the child names at once, as in
+        # ReadableKey.children, so the caller can delete children
+        # without changing the indices used by EnumKey.
+        child_names = backend.enum_keys(handle)
+
+        if not read_values:
+            values = []
+        elif value_types is None:
+            values = backend.enum_values(handle)
+        else:
+            # Names and types first, then only the data needed.
+            values = [
+                (
+                    name,
+                    backend.query_value(handle, name)[0]
+                    if type_ in value_types
+                    else None,
+                    type_,
+                )
+                for name, type_ in backend.enum_value_types(handle)
+            ]
+
+        run_stats = stats.current()
+        if run_stats is not None:
+            run_stats.add("keys visited")
+
+        return child_names, values
+
+    def _read(self, key: ReadableKey, handle: backends.Handle) -> list[str]:
+        # Hook for subclasses (e.g. to skip reading some keys' values).
+        child_names, values = self._enumerate(
+            key.backend, handle, self.read_values, self.value_types
+        )
+
+        if self.read_values:
+            key._cache_registry_values(values, self.value_types, complete=False)
+
+        return child_names
+
+    @staticmethod
+    def _make_child(
+        key: ReadableKey,
+        child_name: str,
+        child_class: Optional[Type[ReadableKey]],
+    ) -> ReadableKey:
+        child_class_ = child_class or key._child_class
+        return child_class_(
+            root=key.root,
+            rel_key=key._child_rel_key(child_name),
+            backend=key._backend,
+        )
+
+    def _pruned(self, key: ReadableKey) -> bool:
+        if self.prune is None or not self.prune(key):
+            return False
+
+        run_stats = stats.current()
+        if run_stats is not None:
+            run_stats.add("keys pruned")
+        return True
+
+    def children(
+        self,
+        key: ReadableKey,
+        child_class: Optional[Type[ReadableKey]] = None,
+    ) -> Optional[list[ReadableKey]]:
+        """Opens key once, caching its values, and returns its
+        children, or None if key is pruned, does not exist or is
+        inaccessible."""
+        if key.root is None:
+            return list(key.children())
+
+        if self._pruned(key):
+            return None
+
+        try:
+            handle = self._open(key)
+        except (OSError, FileExistsError):
+            return None
+
+        try:
+            child_names = self._read(key, handle)
+        finally:
+            self._close(key, handle)
+
+        return [self._make_child(key, name, child_class) for name in child_names]
+
+    def _frame(
+        self,
+        key: ReadableKey,
+        parent_handle: Optional[backends.Handle],
+        name: str,
+        max_depth: Optional[int],
+        skip_children: Optional[Callable[[ReadableKey], bool]],
+        on_enter: Optional[Callable[[ReadableKey], None]],
+    ) -> Optional[_Frame]:
+        # Opens and reads key, or returns None if it is pruned
+        # or cannot be opened.
+        child_depth = None if max_depth is None else max_depth - 1
+
+        if key.root is None:
+            # GlobalRoot has no handle of its own.  Its children
+            # (RootKeys) are opened from their HKEY constants.
+            frame = _Frame(key, None, parent_handle, name, child_depth)
+            children: list = list(key.children())
+        else:
+            if self._pruned(key):
+                return None
+
+            try:
+                handle = self._open(key, parent_handle, name)
+            except (OSError, FileExistsError):
+                # Walking the entire Registry can yield wierd non-existent keys
+                # that only their parents know about.
+                return None
+
+            frame = _Frame(key, handle, parent_handle, name, child_depth)
+            try:
+                children = self._read(key, handle)
+
+                if on_enter is not None:
+                    on_enter(key)
+            except BaseException:
+                self._close(key, handle)
+                raise
+
+        # As before, skip_children is only consulted for the
+        # key the walk was started from.
+        if child_depth == 0 or (skip_children is not None and skip_children(key)):
+            children = []
+
+        frame.children = children
+        return frame
+
+    def _child(
+        self,
+        frame: _Frame,
+        child: Any,
+        child_class: Optional[Type[ReadableKey]],
+    ) -> tuple[ReadableKey, Optional[backends.Handle], str]:
+        if frame.handle is None:
+            # A RootKey, from GlobalRoot.
+            return child, None, ""
+        return self._make_child(frame.key, child, child_class), frame.handle, child
+
+    def _push(self, stack: list[_Frame], frame: _Frame) -> None:
+        stack.append(frame)
+        self._pending += len(frame.children)
+        self.peak_stack_depth = max(self.peak_stack_depth, len(stack))
+        self.peak_pending_keys = max(self.peak_pending_keys, self._pending)
+
+    def _walk(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int],
+        skip_children: Optional[Callable[[ReadableKey], bool]],
+        child_class: Optional[Type[ReadableKey]],
+        on_enter: Optional[Callable[[ReadableKey], None]],
+        order: str = POST_ORDER,
+    ) -> Iterator[tuple[ReadableKey, Optional[backends.Handle], str]]:
+        # Depth first, from an explicit stack of frames (one per
+        # level), instead of one nested generator per level.
+        if max_depth == 0:
+            return
+
+        stack: list[_Frame] = []
+        try:
+            frame = self._frame(key, None, "", max_depth, skip_children, on_enter)
+            if frame is None:
+                return
+            # Pushed before it is yielded, so its handle is closed
+            # even if the walk is abandoned there.
+            self._push(stack, frame)
+            if order == PRE_ORDER:
+                yield key, None, ""
+
+            while stack:
+                frame = stack[-1]
+
+                if frame.next_child < len(frame.children):
+                    child = frame.children[frame.next_child]
+                    frame.next_child += 1
+                    self._pending -= 1
+                    child_key, parent_handle, name = self._child(
+                        frame, child, child_class
+                    )
+                    child_frame = self._frame(
+                        child_key,
+                        parent_handle,
+                        name,
+                        frame.child_depth,
+                        None,
+                        on_enter,
+                    )
+                    if child_frame is None:
+                        continue
+                    self._push(stack, child_frame)
+                    if order == PRE_ORDER:
+                        yield child_key, parent_handle, name
+                    continue
+
+                # All its children have been walked.  Its parent's
+                # handle is still open (further down the stack).
+                stack.pop()
+                if frame.handle is not None:
+                    self._close(frame.key, frame.handle)
+                if order == POST_ORDER:
+                    yield frame.key, frame.parent_handle, frame.name
+        finally:
+            # Abandoned part way through.
+            for frame in reversed(stack):
+                if frame.handle is not None:
+                    self._close(frame.key, frame.handle)
+                self._pending -= len(frame.children) - frame.next_child
+
+    def _walk_breadth_first(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int],
+        skip_children: Optional[Callable[[ReadableKey], bool]],
+        child_class: Optional[Type[ReadableKey]],
+        on_enter: Optional[Callable[[ReadableKey], None]],
+    ) -> Iterator[tuple[ReadableKey, Optional[backends.Handle], str]]:
+        # Holding every handle of a level open would need one handle
+        # per pending key.  So each key is opened from its root's HKEY
+        # constant instead, and closed again before it is yielded (with
+        # no parent handle).  The queue holds every key of up to two
+        # levels at once, so this needs more memory than depth first.
+        if max_depth == 0:
+            return
+
+        pending: collections.deque[tuple[ReadableKey, Optional[int]]]
+        pending = collections.deque([(key, max_depth)])
+
+        while pending:
+            key_, depth = pending.popleft()
+
+            frame = self._frame(key_, None, "", depth, skip_children, on_enter)
+            skip_children = None
+
+            if frame is None:
+                continue
+
+            if frame.handle is not None:
+                self._close(key_, frame.handle)
+
+            yield key_, None, ""
+
+            for child in frame.children:
+                child_key, __, __ = self._child(frame, child, child_class)
+                pending.append((child_key, frame.child_depth))
+
+            self.peak_pending_keys = max(self.peak_pending_keys, len(pending))
+
+    def walk_with_parent_handles(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int] = 5,
+        skip_children: Optional[Callable[[ReadableKey], bool]] = None,
+        child_class: Optional[Type[ReadableKey]] = None,
+        on_enter: Optional[Callable[[ReadableKey], None]] = None,
+        order: str = POST_ORDER,
+    ) -> Iterator[tuple[ReadableKey, Optional[backends.Handle], str]]:
+        """Yields each key Bottom-Up (by default), with its parent's
+        handle (still open, or None for the key the walk was started
+        from) and its name relative to that handle.  on_enter is called
+        on each key after it is opened, before any of its children are
+        walked.
+
+        order=PRE_ORDER yields each key Top-Down instead, as soon as it
+        is opened.  order=BREADTH_FIRST yields each level in turn, with
+        no parent handles.
+        """
+        if order not in WALK_ORDERS:
+            raise Exception(
+                f"Unsupported walk order: {order!r}.  Use one of: {WALK_ORDERS}"
+            )
+
+        if order == BREADTH_FIRST:
+            yield from self._walk_breadth_first(
+                key, max_depth, skip_children, child_class, on_enter
+            )
+            return
+
+        yield from self._walk(
+            key, max_depth, skip_children, child_class, on_enter, order
+        )
+
+    def walk(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int] = 5,
+        skip_children: Optional[Callable[[ReadableKey], bool]] = None,
+        child_class: Optional[Type[ReadableKey]] = None,
+        order: str = POST_ORDER,
+    ) -> Iterator[ReadableKey]:
+        for walked_key, __, __ in self.walk_with_parent_handles(
+            key, max_depth, skip_children, child_class, order=order
+        ):
+            yield walked_key
+
+
+class RegFileTraversalEngine(TraversalEngine):
+    """Writes each key it walks (and its values) in .reg format, parents
+    before children, as it reads them, e.g. with a RegFileWriter's
+    write_section.  Keys named in skip (in lower case), and their sub
+    keys, are neither written nor walked."""
+
+    def __init__(
+        self,
+        write_section: Callable[[str, list[ValueTriple]], Any],
+        skip: Collection[str] = (),
+    ):
+        super().__init__(access=backends.KEY_READ, read_values=True)
+        self.write_section = write_section
+        self.skip = skip
+        self.skipped: set[str] = set()
+
+    def _read(self, key: ReadableKey, handle: backends.Handle) -> list[str]:
+        if self.skip:
+            name = str(key).lower()
+            if name in self.skip:
+                self.skipped.add(name)
+                return []
+
+        child_names, values = self._enumerate(key.backend, handle)
+
+        # With the root's full name, as reg export writes it.
+        key_name = f"{key.root.value}\\{key.rel_key}" if key.rel_key else key.root.value
+        self.write_section(key_name, values)
+
+        return child_names
+
+
+T = TypeVar("T")
+
+
+class _WorkerError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class ParallelWalker:
+    """Fans a walk out over a pool of worker threads, with one task per
+    sub tree split_depth levels below its root key (HKLM etc.), however
+    deep the key the walk starts from is.  E.g. split_depth=1 gives one
+    task per top level key of each root, and split_depth=2 gives one per
+    HKLM\\SOFTWARE\\* child.  A walk that starts at or below split_depth
+    is split one level below its first key.  The keys above the split
+    are expanded in the calling thread.
+
+    The blocking winreg calls release the GIL, so each worker walks its
+    own sub tree with its own TraversalEngine, while the others wait on
+    the Registry.
+
+    If ordered is True, results are yielded in exactly the same order
+    as a serial walk, so that dry runs and purge runs see identical
+    results.  Otherwise they are yielded as soon as any worker
+    produces them.
+    """
+
+    _done = object()
+
+    def __init__(
+        self,
+        workers: int = 4,
+        split_depth: int = 2,
+        ordered: bool = True,
+        access: int = backends.KEY_READ,
+        max_queued: int = 1000,
+        engine_factory: Optional[Callable[[], TraversalEngine]] = None,
+    ):
+        if workers < 1:
+            raise Exception(f"Need at least one worker.  Got: {workers=}")
+
+        self.workers = workers
+        self.split_depth = split_depth
+        self.ordered = ordered
+        self.access = access
+        self.max_queued = max_queued
+        self.engine_factory = engine_factory
+
+    def _engine(self) -> TraversalEngine:
+        # Each task gets its own engine, as engines' counters are not thread safe.
+        if self.engine_factory is not None:
+            return self.engine_factory()
+        return TraversalEngine(access=self.access)
+
+    @staticmethod
+    def _depth_below_root(key: ReadableKey) -> int:
+        # GlobalRoot is -1, the root keys 0, and HKLM\SOFTWARE 1.
+        if key.root is None:
+            return -1
+        if not key.rel_key:
+            return 0
+        return key.rel_key.count("\\") + 1
+
+    def _plan(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int],
+        skip_children: Optional[Callable[[ReadableKey], bool]],
+        child_class: Optional[Type[ReadableKey]],
+        engine: TraversalEngine,
+        split_at: int,
+    ) -> Iterator[tuple[ReadableKey, Optional[int], bool]]:
+        # Yields (key, max_depth, is_sub_tree) in the same Bottom-Up order
+        # as TraversalEngine.walk.  Sub trees are walked by the workers,
+        # other keys are only yielded themselves.
+        if max_depth == 0:
+            return
+
+        if self._depth_below_root(key) >= split_at:
+            yield key, max_depth, True
+            return
+
+        children = engine.children(key, child_class)
+
+        if children is None:
+            return
+
+        # As in TraversalEngine, skip_children only applies to the first key.
+        if skip_children is None or not skip_children(key):
+            for child in children:
+                yield from self._plan(
+                    child,
+                    None if max_depth is None else max_depth - 1,
+                    None,
+                    child_class,
+                    engine,
+                    split_at,
+                )
+
+        yield key, max_depth, False
+
+    def _put(self, out: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _walk_sub_tree(
+        self,
+        key: ReadableKey,
+        max_depth: Optional[int],
+        child_class: Optional[Type[ReadableKey]],
+        per_key: Callable[[ReadableKey], Iterable[T]],
+        out: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        engine = self._engine()
+        try:
+            for walked_key in engine.walk(
+                key, max_depth=max_depth, child_class=child_class
+            ):
+                for item in per_key(walked_key):
+                    if not self._put(out, item, stop):
+                        return
+        except BaseException as e:
+            self._put(out, _WorkerError(e), stop)
+        finally:
+            self._put(out, self._done, stop)
+
+    def _drain(self, in_: queue.Queue, num_tasks: int) -> Iterator[Any]:
+        while num_tasks:
+            item = in_.get()
+            if item is self._done:
+                num_tasks -= 1
+            elif isinstance(item, _WorkerError):
+                raise item.exc
+            else:
+                yield item
+
+    def map(
+        self,
+        key: ReadableKey,
+        per_key: Callable[[ReadableKey], Iterable[T]],
+        max_depth: Optional[int] = 5,
+        skip_children: Optional[Callable[[ReadableKey], bool]] = None,
+        child_class: Optional[Type[ReadableKey]] = None,
+    ) -> Iterator[T]:
+        """Walks key, calling per_key on every key walked (in the
+        worker threads, for keys in the sub trees), and yields
+        everything that per_key returns."""
+        engine = self._engine()
+
+        split_at = max(self.split_depth, self._depth_below_root(key) + 1)
+
+        plan = list(
+            self._plan(key, max_depth, skip_children, child_class, engine, split_at)
+        )
+
+        stop = threading.Event()
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+            if self.ordered:
+                queues: dict[int, queue.Queue] = {}
+                for i, (planned_key, depth, is_sub_tree) in enumerate(plan):
+                    if is_sub_tree:
+                        queues[i] = queue.Queue(maxsize=self.max_queued)
+                        pool.submit(
+                            self._walk_sub_tree,
+                            planned_key,
+                            depth,
+                            child_class,
+                            per_key,
+                            queues[i],
+                            stop,
+                        )
+
+                # Tasks run in the order they were submitted, so the
+                # one being drained is never waiting for a free worker.
+                for i, (planned_key, __, is_sub_tree) in enumerate(plan):
+                    if is_sub_tree:
+                        yield from self._drain(queues[i], 1)
+                    else:
+                        yield from per_key(planned_key)
+            else:
+                shared_queue: queue.Queue = queue.Queue(maxsize=self.max_queued)
+                num_tasks = 0
+                for planned_key, depth, is_sub_tree in plan:
+                    if is_sub_tree:
+                        num_tasks += 1
+                        pool.submit(
+                            self._walk_sub_tree,
+                            planned_key,
+                            depth,
+                            child_class,
+                            per_key,
+                            shared_queue,
+                            stop,
+                        )
+
+                yield from self._drain(shared_queue, num_tasks)
+
+                for planned_key, __, is_sub_tree in plan:
+                    if not is_sub_tree:
+                        yield from per_key(planned_key)
+        finally:
+            # Let the workers exit if the caller stopped iterating early.
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
 class ReadableKey:
+    # Walks and searches make one of these per key, and results hold
+    # on to them, so no per instance __dict__.
+    __slots__ = ("_root", "_rel_key", "_registry_values", "_backend")
+
+    # Class specific overridable default class to assign to
+    # create specific classed of children from (in
+    # self.children and self.walk)
+    #
+    # if None, uses ReadableKey, to force mutable subclasses
+    # and DeletableKeys to be expicitly constructed, instead
+    # of making all their children automatically mutable or
+    # deletable too (principle of least privilege).
+    #
+    # Used to define the normal heirarchy:
+    # GlobalRoot -> RootKey -> ReadableKey -> ReadableKey -> ...
+    _child_class: Type[ReadableKey]
+
     def __init__(
         self,
         root: Optional[Root],
         rel_key: str,
+        backend: Optional[backends.RegistryBackend] = None,
     ):
         if root is None:
             raise Exception(
@@ -227,20 +1466,10 @@ class ReadableKey:
         # Tell Mypy self._root can be None in subclasses (i.e. GlobalRoot)
         self._root: Root | None = root
         self._rel_key = rel_key
-        self._registry_values: CaseInsensitiveDict | None = None
-
-        # Class specific overridable default class to assign to
-        # create specific classed of children from (in
-        # self.children and self.walk)
-        #
-        # if None, uses ReadableKey, to force mutable subclasses
-        # and DeletableKeys to be expicitly constructed, instead
-        # of making all their children automatically mutable or
-        # deletable too (principle of least privilege).
-        #
-        # Used to define the normal heirarchy:
-        # GlobalRoot -> RootKey -> ReadableKey -> ReadableKey -> ...
-        self._child_class = ReadableKey
+        self._registry_values: RegistryValues | None = None
+
+        # If None, uses backends.get_backend() (by default, winreg).
+        self._backend = backend
 
     @property
     def rel_key(self):
@@ -250,17 +1479,45 @@ class ReadableKey:
     def root(self):
         return self._root
 
+    @property
+    def sid(self) -> Optional[str]:
+        """Of the user whose hive (in HKU) the key is in, e.g. S-1-5-18."""
+        if self.root is not Root.HKU or not self.rel_key:
+            return None
+        return self.rel_key.partition("\\")[0].removesuffix("_Classes")
+
+    @property
+    def backend(self) -> backends.RegistryBackend:
+        return self._backend or backends.get_backend()
+
     @classmethod
-    def from_str(cls, str_: str) -> Self:
+    def from_str(
+        cls,
+        str_: str,
+        backend: Optional[backends.RegistryBackend] = None,
+    ) -> Self:
         prefix, __, rel_key = str_.partition("\\")
         # prefix = '' => Should be GlobalRoot
         root = Root.from_str(prefix) if prefix else None
-        return cls(root, rel_key)
+        return cls(root, rel_key, backend=backend)
+
+    @classmethod
+    def from_str_and_values(
+        cls,
+        str_: str,
+        values: Iterable[ValueTriple],
+        value_types: Optional[Collection[int]] = None,
+    ) -> Self:
+        """A key whose values are already known (e.g. from a .reg file),
+        so are not read from the Registry."""
+        key = cls.from_str(str_)
+        key._cache_registry_values(values, value_types)
+        return key
 
     @classmethod
     def from_key(cls, key: ReadableKey) -> Self:
         # Explictly create subclasses with more methods.
-        return cls(key.root, key.rel_key)
+        return cls(key.root, key.rel_key, backend=key._backend)
 
     # I don't know any detailed reasons why these keys should be in
     # the following protected categories, except that errors occur
@@ -294,6 +1551,12 @@ class ReadableKey:
     uninstallers = {
         Root.HKLM: [
             r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
+            # 32 bit programs, on 64 bit Windows
+            r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
+        ],
+        # Programs installed for the current user only
+        Root.HKCU: [
+            r"Software\Microsoft\Windows\CurrentVersion\Uninstall",
         ],
     }
 
@@ -302,6 +1565,32 @@ class ReadableKey:
             _restricted[k] = []
         _restricted[k].extend(v)
 
+    # Files of extra keys to protect, e.g. site specific ones.
+    _policy_files: list[pathlib.Path] = []
+
+    # Compiled from all the above, when first needed, per class (as
+    # sub classes can override them).
+    _policies: dict[type, KeyPolicies] = {}
+
+    @classmethod
+    def policies(cls) -> KeyPolicies:
+        policies = ReadableKey._policies.get(cls)
+        if policies is None:
+            policies = KeyPolicies()
+            policies.add_dict("restricted", cls._restricted)
+            policies.add_dict("do_not_alter_subkeys_of", cls._do_not_alter_subkeys_of)
+            policies.add_dict("do_not_delete_subkeys_of", cls._do_not_delete_subkeys_of)
+            for path in cls._policy_files:
+                policies.load(path)
+            ReadableKey._policies[cls] = policies
+        return policies
+
+    @classmethod
+    def load_policies(cls, path: pathlib.Path) -> None:
+        ReadableKey._policy_files.append(path)
+        # Recompiled when next needed.
+        ReadableKey._policies.clear()
+
     @property
     def root_name(self):
         # Hook for GlobalRoot
@@ -336,7 +1625,7 @@ class ReadableKey:
     def HKEY_Const(self):
         return self.root.HKEY_Const
 
-    def _get_handle(self, access=winreg.KEY_READ):
+    def _get_handle(self, access=backends.KEY_READ):
         if self.root is None:
             raise NoRootError(f"Key: {self} does not exist. ")
         # Caller is responsible for calling .Close().  Otherwise
@@ -344,34 +1633,36 @@ class ReadableKey:
         # collector runs, which can be buggy in
         # non-CPython implementations.
 
-        return winreg.OpenKey(
-            key=self.HKEY_Const, sub_key=self.rel_key, reserved=0, access=access
-        )
+        return self.backend.open_key(self.HKEY_Const, self.rel_key, access=access)
 
     def exists(self) -> bool:
+        run_stats = stats.current()
+        if run_stats is not None:
+            run_stats.add("exists() probes")
+
         try:
-            self._get_handle()
+            self.backend.close(self._get_handle())
             return True
         except (OSError, FileExistsError):
             return False
 
     def restricted(self) -> bool:
-        for rel_key in self._restricted.get(self.root, []):
-            if self.rel_key.lower().startswith(rel_key.lower()):
-                return True
-        return False
+        return self.policies().covers("restricted", self.root, self.rel_key)
 
     def in_alterable_root(self) -> bool:
-        for rel_key in self._do_not_alter_subkeys_of.get(self.root, []):
-            if self.rel_key.lower().startswith(rel_key.lower()):
-                return False
-        return True
+        return not self.policies().covers(
+            "do_not_alter_subkeys_of", self.root, self.rel_key
+        )
 
     def can_delete_subkeys_of_parents(self) -> bool:
-        for rel_key in self._do_not_delete_subkeys_of.get(self.root, []):
-            if self.rel_key.lower().startswith(rel_key.lower()):
-                return False
-        return True
+        return not self.policies().covers(
+            "do_not_delete_subkeys_of", self.root, self.rel_key
+        )
+
+    def protected(self) -> bool:
+        """Whether neither this key nor any of its sub keys can be
+        changed at all (so a walk can prune it, without reading it)."""
+        return self.restricted() or not self.in_alterable_root()
 
     def check_in_alterable_root(self) -> None:
         if not self.in_alterable_root():
@@ -386,132 +1677,174 @@ class ReadableKey:
             raise Exception(f"Cannot delete sub keys of: {self.root.value}")
 
     @contextlib.contextmanager
-    def handle(self, access=winreg.KEY_READ):
+    def handle(self, access=backends.KEY_READ):
         try:
             handle = self._get_handle(access=access)
-        except (OSError, FileExistsError):
-            raise Exception(
+        except OSError as e:
+            # Still an OSError, so callers can tell it from other errors.
+            raise OSError(
+                e.errno,
                 f"Key: {self} does not exist in Registry "
-                f"or is inaccessible under permission: {access}"
-            )
+                f"or is inaccessible under permission: {access}",
+            ) from e
         try:
             yield handle
             # code inside with statement runs
         finally:
-            handle.Close()
+            self.backend.close(handle)
 
     def iter_names_data_and_types(self) -> Iterator[tuple[str, Any, int]]:
         with self.handle() as key_handle:
-            # winreg.QueryInfoKey actually returns a pair & a type. I.e. a triple.
-            __, num_name_data_pairs, __ = winreg.QueryInfoKey(key_handle)
-            for i in range(num_name_data_pairs):
-                yield winreg.EnumValue(key_handle, i)
+            yield from self.backend.enum_values(key_handle)
+
+    def _cache_registry_values(
+        self,
+        names_data_and_types: Iterable[ValueTriple],
+        value_types: Optional[Collection[int]] = None,
+        complete: bool = True,
+    ):
+        """If value_types are given, the data of values of other types
+        will not be searched (and if not complete, has not been read)."""
+        vals: RegistryValues
+        if value_types is None:
+            vals = RegistryValues()
+        else:
+            vals = FilteredValues(complete=complete)
+        types = vals.types
+        dupes = []
+        for name, data, type_ in names_data_and_types:
+            if name in vals:
+                dupes.append(dict(name=name, data=data, type=type_))
+            vals[name] = data
+            types[name.lower()] = type_
+            if value_types is not None and type_ not in value_types:
+                vals.unsearched.add(name.lower())  # type: ignore[attr-defined]
+        self._registry_values = vals
+
+        if dupes:
+            raise Exception(
+                f"Registry key: {self}'s values contain duplicated names ('keys'): {dupes}"
+            )
 
-    def registry_values(self) -> CaseInsensitiveDict:
+    def registry_values(self) -> RegistryValues:
         if self._registry_values is None:
-            self._registry_values = CaseInsensitiveDict()
-            dupes = []
-            for name, data, type_ in self.iter_names_data_and_types():
-                if name in self._registry_values:
-                    dupes.append(dict(name=name, data=data, type=type_))
-                self._registry_values[name] = data
-
-            if dupes:
-                raise Exception(
-                    f"Registry key: {self}'s values contain duplicated names ('keys'): {dupes}"
-                )
+            self._cache_registry_values(self.iter_names_data_and_types())
 
-        return self._registry_values
+        return self._registry_values  # type: ignore[return-value]
 
-    def names_of_path_env_variables(self) -> Iterator[str]:
-        # Speed up walking the registry, so we don't test every
-        # str val/val_name pair on every key.
-        # Could also require self.rel_name.endswith("Environment")
-        if "path" not in self.registry_values():
-            return
+    def _forget_registry_values(self) -> None:
+        # They will be read again, if needed.
+        self._registry_values = None
 
-        # for name, candidate_path in self.registry_values().items():
+    def _complete_registry_values(self) -> bool:
+        # Reads the data not read for a search of only some value
+        # types (e.g. once the key has matched).  Returns whether it did.
+        vals = self._registry_values
+        if not isinstance(vals, FilteredValues) or vals.complete:
+            return False
 
-        candidate_path = self.registry_values()["path"]
+        try:
+            values = list(self.iter_names_data_and_types())
+        except Exception:
+            # e.g. deleted since it was searched.
+            return False
 
-        if not isinstance(candidate_path, str) or not candidate_path:
-            return
+        complete = FilteredValues(
+            ((name, data) for name, data, __ in values),
+            types={name.lower(): type_ for name, __, type_ in values},
+            unsearched=vals.unsearched,
+            complete=True,
+        )
 
-        # in %PATH% from cmd, the user path is appended to the windows
-        # system path.  So we test for this by iterating from
-        # start and end of %PATH%.  This won't find any paths in the middle.
-        #
-        # This uses zip, not itertools.zip_longest, so in one of these two
-        # options, the user's cwd should be ignored at the end of the iterable,
-        # as candidate_path is one shorter.
-
-        candidate_paths = candidate_path.split(";")
-        os_env_paths = PATH.split(";")
-
-        for iterable in [
-            zip(candidate_paths, os_env_paths),
-            zip(reversed(candidate_paths), reversed(os_env_paths)),
-        ]:
-            for reg_path, os_env_path in iterable:
-                if reg_path != os_env_path:
-                    # Don't return False.  Test next iterable (same pair reversed).
-                    break
-                #
-            else:
-                # for/ else - if loop did not hit the break statement,
-                # i.e. if all path entries equalled a corresponding one in
-                # PATH, either from the start of the end.
-                yield "path"
+        self._registry_values = complete
+        return True
 
-                # Don't yield again if the second iterable also tests positive
-                break
+    def names_of_path_env_variables(self) -> Iterator[str]:
+        """Of the values that are the system's or a user's Path (i.e.
+        all their entries are in PATH)."""
+        analyzer = path_lists()
+        for name, data in self.registry_values().items():
+            if analyzer.is_env_path(name, data):
+                yield name
+
+    def names_of_other_path_lists(self) -> Iterator[str]:
+        """Of the other values that are lists of paths (e.g. PSModulePath)."""
+        analyzer = path_lists()
+        for name, data in self.registry_values().items():
+            if analyzer.is_path_list(name, data) and not analyzer.is_env_path(
+                name, data
+            ):
+                yield name
 
     def contains_path_env_variable(self) -> bool:
-        return next(self.names_of_path_env_variables(), None) is not None
+        """If any value is the system's or a user's Path (i.e. all its
+        entries are in PATH)."""
+        analyzer = path_lists()
+        return any(
+            analyzer.is_env_path(name, data)
+            for name, data in self.registry_values().items()
+        )
 
     def walk(
         self,
-        access: int = winreg.KEY_READ,
+        access: int = backends.KEY_READ,
         max_depth: int | None = 5,
         skip_children: Optional[Callable[[Self], bool]] = None,
         child_class: Optional[Type[ReadableKey]] = None,
+        engine: Optional[TraversalEngine] = None,
+        walker: Optional[ParallelWalker] = None,
+        order: str = POST_ORDER,
     ) -> Iterator[Self]:
         """Depth First Search, with each node's children cached.
         By default the nodes are yielded Bottom-Up, from the
         depth cap of max_depth upwards, unless a
         predicate Callable skip_children is specified, (e.g.
         if all sub keys will be deleted anyway) in which
-        case the nodes are returned Lowest-Up."""
-
-        if max_depth == 0 or (self.root and not self.exists()):
+        case the nodes are returned Lowest-Up.  order=PRE_ORDER
+        yields them Top-Down, and order=BREADTH_FIRST level by level.
+
+        Each key is opened once, by a TraversalEngine (pass one
+        in to inspect its handle and memory counters afterwards).  If a
+        ParallelWalker is given, sub trees are walked in its
+        worker threads instead (Bottom-Up only)."""
+        if walker is not None:
+            if order != POST_ORDER:
+                raise Exception(f"ParallelWalker only walks Bottom-Up.  Got: {order=}")
+            yield from walker.map(  # type: ignore[misc]
+                self,
+                per_key=lambda key: (key,),
+                max_depth=max_depth,
+                skip_children=skip_children,  # type: ignore[arg-type]
+                child_class=child_class,
+            )
             return
 
-        if skip_children is None or not skip_children(self):
-            for child in self.children():
-                # Walking the entire Registry can yield wierd non-existent keys
-                # that only their parents know about.
-                if not child.exists():
-                    continue
+        engine = engine or TraversalEngine(access=access)
 
-                yield from child.walk(
-                    access=access,
-                    max_depth=None if max_depth is None else max_depth - 1,
-                )
-
-        yield self
+        yield from engine.walk(  # type: ignore[misc]
+            self,
+            max_depth=max_depth,
+            skip_children=skip_children,  # type: ignore[arg-type]
+            child_class=child_class,
+            order=order,
+        )
 
-    def strs_in_rel_key(self, strs: Collection[str]) -> Iterator[str]:
-        for str_ in strs:
-            if str_ in self.rel_key:
-                yield str_
+    def strs_in_rel_key(self, strs: SearchTerms) -> Iterator[str]:
+        matched = TextMatcher.from_strs(strs).search(self.rel_key)
+        if matched is not None:
+            yield matched
 
     def vals_or_val_names_containing(
-        self, strs: Collection[str]
+        self, strs: SearchTerms
     ) -> Iterator[tuple[str, Any]]:
-        for val_name, val in self.registry_values().items():
-            for str_ in strs:
-                if str_ in val_name or str_ in str(val):
-                    yield val_name, val
+        matcher = TextMatcher.from_strs(strs)
+        vals = self.registry_values()
+        unsearched = getattr(vals, "unsearched", ())
+        for val_name, val in vals.items():
+            if matcher(val_name) or (
+                val_name not in unsearched and matcher.search_data(val) is not None
+            ):
+                yield val_name, val
 
     def display_name(self) -> str:
         vals = self.registry_values()
@@ -519,59 +1852,101 @@ class ReadableKey:
         if "DisplayName" in vals:
             return vals["DisplayName"]
 
+        unsearched = getattr(vals, "unsearched", ())
         for val_name, val in vals.items():
-            if "name" in val_name.lower() and isinstance(val, str):
+            if (
+                "name" in val_name.lower()
+                and isinstance(val, str)
+                and val_name not in unsearched
+            ):
                 return val
 
         return ""
 
     def search_for_text(
         self,
-        strs: Collection[str],
+        strs: SearchTerms,
     ) -> Iterator[SearchResult]:
-        vals = self.registry_values()
+        for result in self._search_for_text(strs):
+            if self._complete_registry_values() and result.val_name:
+                # It matched, so its other values are needed too, e.g.
+                # to purge it, or to plan to (including the one that
+                # matched, if only its name was searched).
+                result.val = self.registry_values()[result.val_name]
+            yield result
+
+    def _search_for_text(
+        self,
+        strs: SearchTerms,
+    ) -> Iterator[SearchResult]:
+        matcher = TextMatcher.from_strs(strs)
 
         display_name = self.display_name()
 
-        for str_ in strs:
-            if str_ in display_name:
-                yield self, display_name, "", "", vals, str_
-                return
+        matched = matcher.search(display_name)
+        if matched is not None:
+            yield SearchResult(self, display_name, str_in_rel_key=matched)
+            return
 
-        for val_name, val in self.vals_or_val_names_containing(strs):
-            yield self, display_name, val_name, val, vals, ""
+        for val_name, val in self.vals_or_val_names_containing(matcher):
+            val_type = self.registry_values().types.get(val_name)
+            yield SearchResult(self, display_name, val_name, val, val_type=val_type)
             return
 
-        for str_ in self.strs_in_rel_key(strs):
-            yield self, display_name, "", "", vals, str_
+        for str_ in self.strs_in_rel_key(matcher):
+            yield SearchResult(self, display_name, str_in_rel_key=str_)
             return
 
     @staticmethod
     def text_in_key_or_vals(
         key,
-        strs: Collection[str],
+        strs: SearchTerms,
     ) -> bool:
         return next(key.search_for_text(strs), None) is not None
 
     def search_key_and_subkeys_for_text(
         self,
-        strs: Collection[str],
+        strs: SearchTerms,
         search_children_of_keys_containing_text: bool = False,
         max_depth: Optional[int] = 5,
+        engine: Optional[TraversalEngine] = None,
+        walker: Optional[ParallelWalker] = None,
     ) -> Iterator[SearchResult]:
+        # Compile the search terms once, for the whole walk.
+        strs = TextMatcher.from_strs(strs)
+
         if search_children_of_keys_containing_text:
             skip_children = None
         else:
             skip_children = functools.partial(self.text_in_key_or_vals, strs=strs)
 
-        for key in self.walk(skip_children=skip_children, max_depth=max_depth):
+        # Each result's key's values are freed once the caller has
+        # moved on to the next one (see SearchResult).
+        if walker is not None:
+            for result in walker.map(
+                self,
+                per_key=lambda key: key.search_for_text(strs),
+                max_depth=max_depth,
+                skip_children=skip_children,
+            ):
+                yield result
+                result.key._forget_registry_values()
+            return
+
+        for key in self.walk(
+            skip_children=skip_children,
+            max_depth=max_depth,
+            engine=engine,
+        ):
             yield from key.search_for_text(strs)
+            key._forget_registry_values()
+
+    def _child_rel_key(self, child_name: str) -> str:
+        return f"{self.rel_key}\\{child_name}" if self.rel_key else child_name
 
     def child_names(self) -> Iterator[str]:
         with self.handle() as handle:
-            num_sub_keys, __, __ = winreg.QueryInfoKey(handle)
-            for i in range(num_sub_keys):
-                yield winreg.EnumKey(handle, i)
+            yield from self.backend.enum_keys(handle)
 
     def children(
         self,
@@ -592,32 +1967,102 @@ class ReadableKey:
         child_class = child_class or self._child_class
 
         for child_name in child_names:
-            child_rel_key = (
-                f"{self.rel_key}\\{child_name}" if self.rel_key else child_name
-            )
             yield child_class(
                 root=self.root,
-                rel_key=child_rel_key,
+                rel_key=self._child_rel_key(child_name),
+                backend=self._backend,
             )
 
 
-# e.g.               key,         display_name, val_name, val, vals, str_in_rel_key
-SearchResult = tuple[ReadableKey, str, str, Any, CaseInsensitiveDict, str]
+ReadableKey._child_class = ReadableKey
+
+
+class SearchResult:
+    """A match: its key, and the value that matched (if any), or the
+    search term found in its display name or its path (str_in_rel_key).
+
+    Only the matched value is kept.  The key's other values (.vals) are
+    cached on the key while the search is on that key (so purges and
+    plans can use them), and read again if needed after that.  So each
+    result needs 144 bytes (80, and 64 for its __slots__ key), plus its
+    key's path, display name and matched value: ~280 bytes in all on
+    the synthetic Registry of benchmarks/bench_registry.py --memory,
+    instead of ~770 for a tuple, a key with a __dict__, and all of its
+    key's values.
+
+    It can still be indexed and unpacked as before:
+        key, display_name, val_name, val, vals, str_in_rel_key = result
+    """
+
+    __slots__ = (
+        "key",
+        "display_name",
+        "val_name",
+        "val",
+        "str_in_rel_key",
+        "val_type",
+    )
+
+    def __init__(
+        self,
+        key: ReadableKey,
+        display_name: str = "",
+        val_name: str = "",
+        val: Any = "",
+        str_in_rel_key: str = "",
+        val_type: Optional[int] = None,
+    ):
+        self.key = key
+        self.display_name = display_name
+        # Value names are repeated in many keys (e.g. "path").
+        self.val_name = sys.intern(val_name)
+        self.val = val
+        self.str_in_rel_key = str_in_rel_key
+        # e.g. backends.REG_SZ, if val_name is given.
+        self.val_type = val_type
+
+    @property
+    def vals(self) -> RegistryValues:
+        return self.key.registry_values()
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self.key
+        yield self.display_name
+        yield self.val_name
+        yield self.val
+        yield self.vals
+        yield self.str_in_rel_key
+
+    def __len__(self) -> int:
+        return 6
+
+    def __getitem__(self, index):
+        # As for the tuples SearchResults used to be, e.g. result[0]
+        return tuple(self)[index]
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({self.key!r}, {self.display_name!r}, "
+            f"{self.val_name!r}, {self.val!r}, {self.str_in_rel_key!r})"
+        )
 
 
 class ReadAndWritableKey(ReadableKey):
+    __slots__ = ("backup_maker",)
+
     def __init__(
         self,
         root: Root,
         rel_key: str,
         backup_maker: Optional[KeyBackupMaker] = None,
+        backend: Optional[backends.RegistryBackend] = None,
     ):
-        super().__init__(root, rel_key)
+        super().__init__(root, rel_key, backend=backend)
 
-        self.backup_maker = backup_maker or CmdKeyBackupMaker.get_shared_instance()
+        self.backup_maker = backup_maker or InProcessKeyBackupMaker.get_shared_instance()
 
     def make_tmp_backup(self) -> None:
-        self.backup_maker.make_tmp_backup_of_registry_key(str(self))
+        self.backup_maker.backup_key(self)
 
     def consolidate_backups(self, dir_: Optional[pathlib.Path] = None) -> None:
         self.backup_maker.consolidate_tmp_backups(dir_)
@@ -637,14 +2082,8 @@ class ReadAndWritableKey(ReadableKey):
         if type_ is None:
             type_ = 1
 
-        with self.handle(access=winreg.KEY_ALL_ACCESS) as handle:
-            winreg.SetValueEx(
-                handle,  # key =
-                name,  # value_name = name,
-                0,  # reserved = 0
-                type_,  # type = type_
-                data,  # value = data
-            )
+        with self.handle(access=backends.KEY_ALL_ACCESS) as handle:
+            self.backend.set_value(handle, name, type_, data)
 
     def set_registry_value_data(
         self,
@@ -656,6 +2095,8 @@ class ReadAndWritableKey(ReadableKey):
 
 
 class KeyWithDeletableValueNamesAndValues(ReadAndWritableKey):
+    __slots__ = ()
+
     def _delete_value_and_value_name(
         self,
         value_name: str,
@@ -668,15 +2109,17 @@ class KeyWithDeletableValueNamesAndValues(ReadAndWritableKey):
         if save_backup_first:
             self.make_tmp_backup()
 
-        with self.handle(access=winreg.KEY_ALL_ACCESS) as handle:
-            winreg.DeleteValue(handle, value_name)
+        with self.handle(access=backends.KEY_ALL_ACCESS) as handle:
+            self.backend.delete_value(handle, value_name)
 
     def delete_value_and_value_name(self, value_name: str):
         self._delete_value_and_value_name(value_name, save_backup_first=True)
 
 
 class DeletableKey(ReadAndWritableKey):
-    def _delete(self, save_backup_first: bool = True) -> None:
+    __slots__ = ()
+
+    def check_deletable(self) -> None:
         self.check_in_alterable_root()
 
         self.check_not_restricted()
@@ -688,32 +2131,77 @@ class DeletableKey(ReadAndWritableKey):
                 f"Cannot delete key whose value contains system path data: {self}"
             )
 
-        if save_backup_first:
-            self.make_tmp_backup()
-
-        for key in self.children(child_class=DeletableKey):
-            key._delete(save_backup_first=not self.backup_maker.backs_up_sub_keys_too)
+    def _delete(self, save_backup_first: bool = True) -> None:
+        # Each key (and each of its descendants) is checked and backed up
+        # before any of its own sub keys are deleted, then deleted Bottom-Up
+        # through its parent's open handle.
+        def check_and_backup(key: DeletableKey) -> None:
+            key.check_deletable()
+
+            if key is self:
+                if save_backup_first:
+                    key.make_tmp_backup()
+            elif not self.backup_maker.backs_up_sub_keys_too:
+                self.backup_maker.backup_key(key)
+
+        engine = TraversalEngine(access=backends.KEY_ALL_ACCESS)
+
+        deleted_self = False
+
+        for key, parent_handle, name in engine.walk_with_parent_handles(
+            self,
+            max_depth=None,
+            # Descendants share this key's backup maker.
+            child_class=functools.partial(  # type: ignore[arg-type]
+                DeletableKey, backup_maker=self.backup_maker
+            ),
+            on_enter=check_and_backup,  # type: ignore[arg-type]
+        ):
+            if parent_handle is None:
+                key.backend.delete_key(key.HKEY_Const, key.rel_key)
+                deleted_self = True
+            else:
+                key.backend.delete_key(parent_handle, name)
 
-        with self.handle(access=winreg.KEY_ALL_ACCESS) as handle:
-            winreg.DeleteKey(handle, "")
+        if not deleted_self:
+            raise Exception(
+                f"Key: {self} does not exist in Registry "
+                f"or is inaccessible under permission: {backends.KEY_ALL_ACCESS}"
+            )
 
     def delete(self) -> None:
         self._delete(save_backup_first=True)
 
 
 class RootKey(ReadableKey):
-    def __init__(self, root: Optional[Root], rel_key: str = ""):
+    __slots__ = ()
+
+    _child_class = ReadableKey
+
+    def __init__(
+        self,
+        root: Optional[Root],
+        rel_key: str = "",
+        backend: Optional[backends.RegistryBackend] = None,
+    ):
         # Keep rel_key in __init__ args so that from_str still works as is.
         if rel_key:
             raise Exception(f"RootKeys cannot have a relative key. Got: {rel_key=}")
 
-        super().__init__(root=root, rel_key="")
-
-        self._child_class = ReadableKey
+        super().__init__(root=root, rel_key="", backend=backend)
 
 
 class GlobalRoot(RootKey):
-    def __init__(self, root: Optional[Root] = None, rel_key: str = ""):
+    __slots__ = ()
+
+    _child_class = RootKey
+
+    def __init__(
+        self,
+        root: Optional[Root] = None,
+        rel_key: str = "",
+        backend: Optional[backends.RegistryBackend] = None,
+    ):
         if root is not None:
             raise Exception(f"GlobalRoot has no root itself.  Got: {root=}")
 
@@ -722,8 +2210,8 @@ class GlobalRoot(RootKey):
 
         self._root = None
         self._rel_key = ""
-
-        self._child_class = RootKey
+        self._registry_values = None
+        self._backend = backend
 
     @property
     def HKEY_Const(self) -> None:
@@ -737,7 +2225,7 @@ class GlobalRoot(RootKey):
         return False
 
     def registry_values(self):
-        return CaseInsensitiveDict()
+        return RegistryValues()
 
     def child_names(self):
         for root in Root:
@@ -745,7 +2233,89 @@ class GlobalRoot(RootKey):
 
     def children(self, child_class: Optional[Type[ReadableKey]] = None):
         for root in Root:
-            yield RootKey(root)
+            yield RootKey(root, backend=self._backend)
+
+
+class RegistryAliases:
+    """The root keys (and sub keys of HKU) that are only views of keys
+    that a walk from the global root walks elsewhere anyway:
+
+        HKCR: HKLM\\SOFTWARE\\Classes merged with HKCU\\Software\\Classes
+        HKCC: HKLM\\SYSTEM\\CurrentControlSet\\Hardware Profiles\\Current
+        HKU\\<the current user's SID>: HKCU
+        HKU\\<SID>_Classes: HKU\\<SID>\\Software\\Classes
+        HKU\\.DEFAULT: HKU\\S-1-5-18 (LocalSystem's profile)
+
+    Used to prune a global walk, so each physical sub tree is walked
+    once, and each match is reported once, at its canonical path.  The
+    current user's keys stay under HKCU (not HKU\\<SID>), as that is
+    where the protected keys are listed.
+    """
+
+    roots = (Root.HKCR, Root.HKCC)
+
+    profile_list = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList"
+
+    def __init__(self, hku_aliases: Iterable[str] = ()):
+        # Names of sub keys of HKU, in lower case.
+        self.hku_aliases = frozenset(name.lower() for name in hku_aliases)
+
+    def __call__(self, key: ReadableKey) -> bool:
+        # Called on every key walked, so no more than two comparisons for most.
+        if key.root in self.roots:
+            return True
+        return key.root is Root.HKU and key.rel_key.lower() in self.hku_aliases
+
+    @classmethod
+    def current_user_sid(
+        cls,
+        backend: Optional[backends.RegistryBackend] = None,
+    ) -> Optional[str]:
+        """Of the profile in the current user's profile directory."""
+        user_profile = getenv("USERPROFILE")
+        if not user_profile:
+            return None
+        user_profile = os.path.normcase(os.path.normpath(user_profile))
+
+        profile_list = ReadableKey(Root.HKLM, cls.profile_list, backend=backend)
+        for key in profile_list.walk(max_depth=2):
+            path = key.registry_values().get("profileimagepath")
+            if key.rel_key == cls.profile_list or not isinstance(path, str):
+                continue
+            path = os.path.normcase(os.path.normpath(os.path.expandvars(path)))
+            if path == user_profile:
+                return key.rel_key.rpartition("\\")[2]
+
+        return None
+
+    @classmethod
+    def find(
+        cls,
+        backend: Optional[backends.RegistryBackend] = None,
+    ) -> RegistryAliases:
+        hku = RootKey(Root.HKU, backend=backend)
+        try:
+            names = list(hku.child_names())
+        except OSError:
+            names = []
+        loaded = {name.lower() for name in names}
+
+        aliases = [
+            name
+            for name in names
+            if name.lower().endswith("_classes")
+            and name.lower().removesuffix("_classes") in loaded
+        ]
+
+        # If it cannot be found, HKCU and HKU\<SID> are both walked.
+        sid = cls.current_user_sid(backend)
+        if sid is not None and sid.lower() in loaded:
+            aliases.append(sid)
+
+        if ".default" in loaded and "s-1-5-18" in loaded:
+            aliases.append(".DEFAULT")
+
+        return cls(aliases)
 
 
 uninstallers_keys = [
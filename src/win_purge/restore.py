@@ -0,0 +1,152 @@
+"""Restores keys from the .reg backups made before they were changed
+or deleted.
+
+Each consolidated backup has an index of the byte offset of every key's
+section, so a key (and its sub keys) can be read from even a huge
+backup without parsing the rest of it.  Like reg import, restoring a
+key adds its backed up sub keys and values back, without deleting
+anything added since.
+"""
+from __future__ import annotations
+import pathlib
+from typing import Collection, Iterable, Iterator, Optional
+
+from . import backends, reglib, regfile
+
+
+def default_backups_dir() -> pathlib.Path:
+    return (
+        reglib.app_data_dir()
+        / reglib.CmdKeyBackupMaker.app_folder_name
+        / "registry_backups"
+    )
+
+
+def reg_file_key_name(name: str) -> str:
+    """With the root's full name, as in .reg files,
+    e.g. HKLM\\SOFTWARE -> HKEY_LOCAL_MACHINE\\SOFTWARE"""
+    key = reglib.ReadableKey.from_str(name.strip("\\"))
+    if key.root is None:
+        raise Exception(f"Cannot restore the global root: {name}")
+    return f"{key.root.value}\\{key.rel_key}" if key.rel_key else key.root.value
+
+
+def entries_for_key(
+    index: Iterable[regfile.IndexEntry],
+    name: str,
+) -> list[regfile.IndexEntry]:
+    """The index entries of the key name (a .reg file key name) and its sub keys."""
+    name = name.lower()
+    prefix = f"{name}\\"
+    return [
+        entry
+        for entry in index
+        if entry[0].lower() == name or entry[0].lower().startswith(prefix)
+    ]
+
+
+def iter_indexed_backups(
+    dir_: Optional[pathlib.Path] = None,
+) -> Iterator[tuple[pathlib.Path, list[regfile.IndexEntry]]]:
+    """Each backup in dir_ that has an index, most recent first."""
+    dir_ = dir_ or default_backups_dir()
+
+    backups = []
+    for path in dir_.glob(f"{reglib.CmdKeyBackupMaker.prefix}*"):
+        if not path.name.endswith(reglib.CmdKeyBackupMaker.suffixes):
+            continue
+        try:
+            backups.append((reglib.CmdKeyBackupMaker._index(path), path))
+        except ValueError:
+            continue
+
+    for __, path in sorted(backups, reverse=True):
+        try:
+            index = regfile.read_index(path)
+        except OSError:
+            # Made before backups were indexed.
+            continue
+        yield path, index
+
+
+def find_latest_backup(
+    name: str,
+    dir_: Optional[pathlib.Path] = None,
+) -> Optional[tuple[pathlib.Path, list[regfile.IndexEntry]]]:
+    """The most recent backup of the key name (or of any of its
+    sub keys), and the index entries of its sections in it."""
+    name = reg_file_key_name(name)
+    for path, index in iter_indexed_backups(dir_):
+        entries = entries_for_key(index, name)
+        if entries:
+            return path, entries
+    return None
+
+
+def import_sections(
+    sections: Iterable[regfile.RegSection],
+    backend: Optional[backends.RegistryBackend] = None,
+) -> int:
+    """Writes sections to the Registry (as reg import would).
+    Returns the number of keys written."""
+    backend = backend or backends.get_backend()
+    num_keys = 0
+    for section in sections:
+        root, __, rel_key = section.key.partition("\\")
+        handle = backend.create_key(backends.hkey_const(root), rel_key)
+        try:
+            for name in section.deleted_values:
+                backend.delete_value(handle, name)
+            for name, data, type_ in section.values:
+                backend.set_value(handle, name, type_, data)
+        finally:
+            backend.close(handle)
+        num_keys += 1
+    return num_keys
+
+
+def restore_keys(
+    keys: Collection[str],
+    backup: Optional[pathlib.Path] = None,
+    backups_dir: Optional[pathlib.Path] = None,
+    list_only: bool = False,
+) -> None:
+    for name in keys:
+        reg_file_name = reg_file_key_name(name)
+
+        if backup is None:
+            found = find_latest_backup(reg_file_name, backups_dir)
+            if found is None:
+                print(f"No indexed backup found of: {name}")
+                continue
+            path, entries = found
+        else:
+            path = pathlib.Path(backup)
+            entries = entries_for_key(regfile.read_index(path), reg_file_name)
+            if not entries:
+                print(f"No backup of: {name} in: {path}")
+                continue
+
+        print(f"{len(entries)} key(s) backed up under: {reg_file_name} in: {path}")
+
+        if list_only:
+            for key_name, __, __ in entries:
+                print(f"    {key_name}")
+            continue
+
+        confirmation = input(f"Restore: {reg_file_name} from: {path}? (y/n/quit) ")
+
+        if confirmation.lower().startswith("q"):
+            return
+
+        if confirmation.lower() != "y":
+            continue
+
+        key = reglib.ReadAndWritableKey.from_str(name.strip("\\"))
+        key.check_in_alterable_root()
+        # So that the restore can be undone too.
+        key.make_tmp_backup()
+
+        num_keys = import_sections(regfile.read_sections_at(path, entries), key.backend)
+
+        print(f"Restored {num_keys} key(s) under: {reg_file_name}")
@@ -0,0 +1,226 @@
+"""Per-run counters and timings, e.g. for win_purge <command> --stats
+
+Disabled by default.  While disabled, the only overhead is a call
+to current() (returning None) in a few places per key.
+
+    stats = win_purge.stats.enable()
+    ...
+    print(stats.report())
+    win_purge.stats.disable()
+"""
+from __future__ import annotations
+import time
+import threading
+import contextlib
+import collections
+from typing import Any, Iterator, Optional
+
+from . import backends
+
+
+class Stats:
+    def __init__(self):
+        # Per operation, e.g. "OpenKey", "EnumValue", "reg export", "match"
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.seconds: collections.defaultdict[str, float] = collections.defaultdict(
+            float
+        )
+        # e.g. "keys visited", "values read", "value bytes decoded"
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.started = time.perf_counter()
+        # ParallelWalker's workers all record to the same Stats.
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            self.calls[operation] += calls
+            self.seconds[operation] += seconds
+
+    def add(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[counter] += n
+
+    @contextlib.contextmanager
+    def timed(self, operation: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, time.perf_counter() - start)
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "operations": {
+                    operation: {"calls": calls, "seconds": self.seconds[operation]}
+                    for operation, calls in self.calls.items()
+                },
+                "counts": dict(self.counts),
+            }
+
+    def report(self) -> str:
+        stats = self.as_dict()
+        lines = [f"{'Operation':<16}{'Calls':>12}{'Total (s)':>12}{'Mean (us)':>12}"]
+        for operation, op_stats in sorted(
+            stats["operations"].items(), key=lambda item: -item[1]["seconds"]
+        ):
+            calls, seconds = op_stats["calls"], op_stats["seconds"]
+            mean_us = 1e6 * seconds / calls if calls else 0.0
+            lines.append(f"{operation:<16}{calls:>12}{seconds:>12.3f}{mean_us:>12.1f}")
+        for counter, n in sorted(stats["counts"].items()):
+            lines.append(f"{counter:<28}{n:>12}")
+        lines.append(f"{'wall time (s)':<28}{stats['wall_seconds']:>12.3f}")
+        return "\n".join(lines)
+
+
+def value_size(data: Any) -> int:
+    """Approximate bytes of Registry data (strings are UTF-16)."""
+    if isinstance(data, str):
+        return 2 * (len(data) + 1)
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, int):
+        return 4 if 0 <= data < 2**32 else 8
+    if isinstance(data, list):
+        return sum(value_size(str_) for str_ in data) + 2
+    return 0
+
+
+class InstrumentedBackend(backends.RegistryBackend):
+    """Times every call to another backend (by default, winreg's),
+    under winreg's names for the operations."""
+
+    def __init__(
+        self,
+        stats: Stats,
+        inner: Optional[backends.RegistryBackend] = None,
+    ):
+        self.stats = stats
+        self._inner = inner
+
+    @property
+    def inner(self) -> backends.RegistryBackend:
+        # Created lazily, as it need not be winreg's, e.g. for offline searches.
+        if self._inner is None:
+            self._inner = backends.WinregBackend()
+        return self._inner
+
+    def _timed(self, operation: str, method: str, *args) -> Any:
+        start = time.perf_counter()
+        try:
+            return getattr(self.inner, method)(*args)
+        finally:
+            self.stats.record(operation, time.perf_counter() - start)
+
+    def _count_values(self, values: list[backends.ValueTriple]) -> None:
+        self.stats.add("values read", len(values))
+        # Each value is (name, data, type).
+        num_bytes = sum(value_size(value[1]) for value in values)
+        self.stats.add("value bytes decoded", num_bytes)
+
+    def open_key(
+        self,
+        key: backends.Handle,
+        sub_key: str,
+        access: int = backends.KEY_READ,
+    ) -> backends.Handle:
+        return self._timed("OpenKey", "open_key", key, sub_key, access)
+
+    def close(self, handle: backends.Handle) -> None:
+        self._timed("CloseKey", "close", handle)
+
+    def query_info_key(self, handle: backends.Handle) -> tuple[int, int, int]:
+        return self._timed("QueryInfoKey", "query_info_key", handle)
+
+    def enum_key(self, handle: backends.Handle, index: int) -> str:
+        return self._timed("EnumKey", "enum_key", handle, index)
+
+    def enum_value(self, handle: backends.Handle, index: int) -> backends.ValueTriple:
+        value = self._timed("EnumValue", "enum_value", handle, index)
+        self._count_values([value])
+        return value
+
+    def enum_keys(self, handle: backends.Handle) -> list[str]:
+        if type(self.inner).enum_keys is backends.RegistryBackend.enum_keys:
+            # Time each of the inner backend's calls separately.
+            return super().enum_keys(handle)
+        start = time.perf_counter()
+        names = self.inner.enum_keys(handle)
+        self.stats.record("EnumKey", time.perf_counter() - start, len(names))
+        return names
+
+    def enum_values(self, handle: backends.Handle) -> list[backends.ValueTriple]:
+        if type(self.inner).enum_values is backends.RegistryBackend.enum_values:
+            # enum_value counts the values itself.
+            return super().enum_values(handle)
+        start = time.perf_counter()
+        values = self.inner.enum_values(handle)
+        self.stats.record("EnumValue", time.perf_counter() - start, len(values))
+        self._count_values(values)
+        return values
+
+    def enum_value_types(self, handle: backends.Handle) -> list[tuple[str, int]]:
+        inner_method = type(self.inner).enum_value_types
+        if inner_method is backends.RegistryBackend.enum_value_types:
+            # Reads the data too (and counts it).
+            return super().enum_value_types(handle)
+        start = time.perf_counter()
+        names_and_types = self.inner.enum_value_types(handle)
+        self.stats.record(
+            "EnumValue (no data)", time.perf_counter() - start, len(names_and_types)
+        )
+        return names_and_types
+
+    def query_value(self, handle: backends.Handle, name: str) -> tuple[Any, int]:
+        data, type_ = self._timed("QueryValueEx", "query_value", handle, name)
+        self._count_values([(name, data, type_)])
+        return data, type_
+
+    def set_value(
+        self,
+        handle: backends.Handle,
+        name: str,
+        type_: int,
+        data: Any,
+    ) -> None:
+        self._timed("SetValueEx", "set_value", handle, name, type_, data)
+
+    def delete_key(self, handle: backends.Handle, sub_key: str) -> None:
+        self._timed("DeleteKey", "delete_key", handle, sub_key)
+
+    def delete_value(self, handle: backends.Handle, name: str) -> None:
+        self._timed("DeleteValue", "delete_value", handle, name)
+
+    def create_key(self, key: backends.Handle, sub_key: str) -> backends.Handle:
+        return self._timed("CreateKey", "create_key", key, sub_key)
+
+
+_current: Optional[Stats] = None
+
+_uninstrumented_backend: Optional[backends.RegistryBackend] = None
+
+
+def current() -> Optional[Stats]:
+    return _current
+
+
+def enable() -> Stats:
+    """Starts a new Stats, and instruments the default backend
+    (keys given their own backend are not instrumented)."""
+    global _current, _uninstrumented_backend
+    disable()
+    _current = Stats()
+    _uninstrumented_backend = backends._backend
+    backends.set_backend(InstrumentedBackend(_current, _uninstrumented_backend))
+    return _current
+
+
+def disable() -> Optional[Stats]:
+    global _current, _uninstrumented_backend
+    stats = _current
+    if stats is not None:
+        backends.set_backend(_uninstrumented_backend)
+    _current = None
+    _uninstrumented_backend = None
+    return stats
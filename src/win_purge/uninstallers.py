@@ -0,0 +1,143 @@
+"""An index of the installed programs' uninstallers, read once per run
+from every Uninstall key (64 and 32 bit, machine wide and per user),
+each in its own thread.
+"""
+from __future__ import annotations
+import pathlib
+import concurrent.futures
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from . import backends, reglib, stats
+
+
+class Uninstaller(NamedTuple):
+    # e.g. HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall\Acme
+    key: str
+    # The last part of key, e.g. a product's name or GUID
+    name: str
+    display_name: str
+    publisher: str
+    uninstall_string: str
+    install_location: str
+    # The key's other value names and data, so the guard matches
+    # anything in an uninstaller's key, not just the fields above.
+    other_values: tuple[tuple[str, Any], ...]
+
+    def text(self) -> str:
+        return "\n".join(
+            [
+                self.name,
+                self.display_name,
+                self.publisher,
+                self.uninstall_string,
+                self.install_location,
+            ]
+        )
+
+    def matches(self, matcher: reglib.TextMatcher) -> bool:
+        """Other values' data is matched as a search of their key would
+        (e.g. binary data as bytes, not as its repr)."""
+        return matcher(self.text()) or any(
+            matcher(val_name) or matcher.search_data(val) is not None
+            for val_name, val in self.other_values
+        )
+
+
+FIELDS = {
+    "displayname": "display_name",
+    "publisher": "publisher",
+    "uninstallstring": "uninstall_string",
+    "installlocation": "install_location",
+}
+
+
+def _uninstaller(key: reglib.ReadableKey) -> Uninstaller:
+    fields = dict.fromkeys(FIELDS.values(), "")
+    other_values = []
+    for val_name, val in key.registry_values().items():
+        field = FIELDS.get(val_name.lower())
+        if field is not None and isinstance(val, str):
+            fields[field] = val
+        else:
+            other_values.append((val_name, val))
+
+    return Uninstaller(
+        key=str(key),
+        name=key.rel_key.rpartition("\\")[2],
+        other_values=tuple(other_values),
+        **fields,
+    )
+
+
+def _read(uninstall_key: reglib.ReadableKey) -> list[Uninstaller]:
+    # Each uninstaller's values are read with its sub key name,
+    # from the same handle.
+    return [
+        _uninstaller(key)
+        for key in uninstall_key.walk(max_depth=2)
+        if key.rel_key != uninstall_key.rel_key
+    ]
+
+
+class UninstallerIndex:
+    def __init__(self, uninstallers: Iterable[Uninstaller]):
+        self.uninstallers = tuple(uninstallers)
+
+    @classmethod
+    def read(
+        cls,
+        uninstall_keys: Optional[list[reglib.ReadableKey]] = None,
+    ) -> UninstallerIndex:
+        uninstall_keys = uninstall_keys or reglib.uninstallers_keys
+
+        run_stats = stats.current()
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(uninstall_keys)
+        ) as executor:
+            uninstallers_lists = list(executor.map(_read, uninstall_keys))
+
+        index = cls(
+            uninstaller
+            for uninstallers in uninstallers_lists
+            for uninstaller in uninstallers
+        )
+
+        if run_stats is not None:
+            run_stats.add("uninstallers indexed", len(index))
+
+        return index
+
+    def __len__(self) -> int:
+        return len(self.uninstallers)
+
+    def matching(self, search_terms: reglib.SearchTerms) -> Iterator[Uninstaller]:
+        matcher = reglib.TextMatcher.from_strs(search_terms)
+        for uninstaller in self.uninstallers:
+            if uninstaller.matches(matcher):
+                yield uninstaller
+
+    def install_locations(
+        self, search_terms: reglib.SearchTerms
+    ) -> Iterator[pathlib.Path]:
+        """Of the uninstallers check_uninstallers reports (matched in
+        the same way), so only a program that should be uninstalled
+        first can add its installation directory."""
+        for uninstaller in self.matching(search_terms):
+            if uninstaller.install_location:
+                yield pathlib.Path(uninstaller.install_location)
+
+
+_index: Optional[UninstallerIndex] = None
+
+_index_backend: Optional[backends.RegistryBackend] = None
+
+
+def get_index() -> UninstallerIndex:
+    """Read once, per run (or whenever the default backend is changed)."""
+    global _index, _index_backend
+    backend = backends.get_backend()
+    if _index is None or _index_backend is not backend:
+        _index = UninstallerIndex.read()
+        _index_backend = backend
+    return _index